@@ -12,9 +12,11 @@
     "depends": ["delivery_package_number", "delivery_state", "delivery_price_method","sale_order_batch"],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "wizards/banlingkit_manifest_wizard_views.xml",
         "wizards/banlingkit_pickup_wizard.xml",
         "views/delivery_banlingkit_view.xml",
         "views/stock_picking_views.xml",
+        "views/banlingkit_shipment_job_views.xml",
     ],
 }
\ No newline at end of file
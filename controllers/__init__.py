@@ -1 +1,3 @@
-from .deliver_print import DeliverPrintController
\ No newline at end of file
+from .deliver_print import DeliverPrintController
+from .banlingkit_metrics import BanlingkitMetricsController
+from .banlingkit_tracking import BanlingkitTrackingController
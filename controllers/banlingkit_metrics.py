@@ -0,0 +1,22 @@
+from odoo import http
+from odoo.http import request
+
+from ..models.banlingkit_circuit_breaker import breakers_snapshot
+from ..models.banlingkit_metrics import metrics
+
+
+class BanlingkitMetricsController(http.Controller):
+    @http.route('/delivery/banlingkit/metrics', type='http', auth='user')
+    def banlingkit_metrics(self, account=None, **kw):
+        """Banlingkit operations metrics of the worker answering the request
+
+        :param str account: Only return this API client id metrics
+        """
+        if not request.env.user.has_group('stock.group_stock_manager'):
+            return request.not_found()
+        return request.make_json_response(
+            {
+                "operations": metrics.snapshot(account),
+                "circuits": breakers_snapshot(account),
+            }
+        )
@@ -0,0 +1,47 @@
+import gzip
+import json
+
+from odoo import http
+from odoo.http import request
+
+from ..models.banlingkit_request import BanlingkitExpressRequest
+
+
+class BanlingkitTrackingController(http.Controller):
+    @http.route('/delivery/banlingkit/tracking', type='http', auth='none', methods=['POST'], csrf=False)
+    def banlingkit_tracking_push(self, cid=None, **kw):
+        """Receive the tracking events pushed by Banlingkit
+
+        The account is authenticated with its ``cid`` and ``salt`` headers.
+        Events are only queued here. The *apply tracking pushes* scheduled
+        action stores them in batches and it's triggered right away.
+
+        :param str cid: API client id, when it isn't given as a header
+        """
+        headers = request.httprequest.headers
+        carrier = request.env['delivery.carrier'].sudo()._banlingkit_push_carrier(
+            headers.get('cid') or cid, headers.get('salt')
+        )
+        if not carrier:
+            return request.make_json_response(
+                {'code': 401, 'msg': 'Unauthorized'}, status=401
+            )
+        body = request.httprequest.get_data()
+        try:
+            if headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            payload = json.loads(body)
+        except (OSError, ValueError):
+            return request.make_json_response(
+                {'code': 400, 'msg': 'Invalid JSON'}, status=400
+            )
+        events = BanlingkitExpressRequest.parse_tracking_push(payload)
+        if events:
+            request.env['banlingkit.tracking.push'].sudo()._enqueue(carrier, events)
+            cron = request.env.ref(
+                'delivery_banlingkit.ir_cron_banlingkit_tracking_push',
+                raise_if_not_found=False,
+            )
+            if cron:
+                cron.sudo()._trigger()
+        return request.make_json_response({'code': 1, 'count': len(events)})
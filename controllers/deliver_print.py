@@ -1,97 +1,105 @@
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
 from odoo import http
-from odoo.http import request
-from reportlab.pdfgen import canvas
-from reportlab.graphics.barcode import code128
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.units import mm
-from reportlab.lib.pagesizes import landscape
-import io
-import os
-from datetime import datetime
+from odoo.http import Response, request
+
+from ..models.banlingkit_label import (
+    LABEL_MIMETYPES,
+    labels_document_type,
+    render_label,
+    render_labels,
+)
+
+# Rendered PDFs bigger than this are spooled to disk before streaming them
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
 
 class DeliverPrintController(http.Controller):
+    def _can_print(self):
+        return request.env.user.has_group('stock.group_stock_user')
+
+    def _labels_domain(self, domain):
+        """Only Banlingkit shippings the user can read are printed"""
+        return domain + [('carrier_id.delivery_type', '=', 'banlingkit')]
+
     @http.route('/delivery/print_label', type='http', auth='user')
-    def print_label(self, tracking_no=None, **kw):
-        if not tracking_no:
-            return request.not_found()
-        
-        font_path = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), '..', 'static', 'fonts', 'Microsoft_YaHei.ttf')
-        )
-        if 'Microsoft_YaHei' not in pdfmetrics.getRegisteredFontNames():
-            pdfmetrics.registerFont(TTFont('Microsoft_YaHei', font_path))
+    def print_label(self, tracking_no=None, label_format=None, **kw):
+        """Print the label of a shipping
 
-        # 获取当前打印时间
-        print_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        :param str tracking_no: Tracking number
+        :param str label_format: pdf, png, bmp, zpl or epl. Defaults to the
+            carrier one
+        """
+        if not tracking_no or not self._can_print():
+            return request.not_found()
 
         # 查找 sale.order
-        picking = request.env['stock.picking'].sudo().search([('carrier_tracking_ref', '=', tracking_no)], limit=1)
+        picking = request.env['stock.picking'].search(self._labels_domain([('carrier_tracking_ref', '=', tracking_no)]), limit=1).sudo()
         if not picking or not picking.sale_id:
             return request.not_found()
-        order = picking.sale_id
-
-        # 获取信息
-        partner = order.partner_shipping_id or order.partner_id
-        address = partner.contact_address or ''
-        region = partner.state_id.name if partner.state_id else ''
-        city = partner.city or ''
-        phone = partner.phone or ''
-        name = partner.name or ''
-        country = partner.country_id.name if partner.country_id else ''
-
-        buffer = io.BytesIO()
-        width, height = 150 * mm, 80 * mm  # 横向：宽150mm，高80mm
-        pagesize = (width, height)
-        c = canvas.Canvas(buffer, pagesize=pagesize)
-
-        # 顶部距离页面上边缘 8mm
-        top = height - 8 * mm
-
-        c.setFont("Microsoft_YaHei", 12)
-        c.drawString(3 * mm, top, f"面单号: {tracking_no}")
-
-        # 生成一维码，紧跟在面单号下方
-        barcode = code128.Code128(tracking_no, barHeight=15 * mm, barWidth=1.2)
-        barcode_width = barcode.width
-        x = (width - barcode_width) / 2  # 居中
-        barcode_y = top - 6 * mm - 15 * mm  # 面单号下方12mm，条码高度15mm
-        barcode.drawOn(c, x, barcode_y)
-
-        # 继续绘制其他内容
-        line_gap = 7 * mm
-        content_top = barcode_y - 10 * mm  # 条码下方再空10mm开始内容
-        c.setFont("Microsoft_YaHei", 10)
-        c.drawString(3 * mm, content_top, f"收件人/国家: {name} {country}")
-        c.drawString(3 * mm, content_top - line_gap, f"省份/城市: {region} {city}")
-        c.drawString(3 * mm, content_top - 2 * line_gap, f"地址: {address}")
-        c.drawString(3 * mm, content_top - 3 * line_gap, f"打印时间: {print_time}")
-
-        # 商品内容
-        y = content_top - 4 * line_gap  # 提高起始位置
-        c.setFont("Microsoft_YaHei", 10)
-        c.drawString(3 * mm, y, "商品列表:")
-        y -= 3.5 * mm  # 更小的行距
-        for line in order.order_line:
-            # 获取变体值字符串
-            variant = ''
-            if line.product_id.product_template_attribute_value_ids:
-                variant = ' [' + ', '.join(v.name for v in line.product_id.product_template_attribute_value_ids) + ']'
-            product_str = f"{line.product_id.display_name}{variant} x {line.product_uom_qty}"
-            c.drawString(8 * mm, y, product_str)
-            y -= 3.5 * mm
-            if y < 15 * mm:  # 保证不与底部内容重叠
-                c.drawString(8 * mm, y, "...")
-                break
-
-        c.showPage()
-        c.save()
-        pdf = buffer.getvalue()
-        buffer.close()
+        options = picking.carrier_id._banlingkit_label_options()
+        label_format = label_format or options['label_format']
+        if label_format not in LABEL_MIMETYPES:
+            return request.not_found()
+
+        label = render_label(picking, tracking_no, label_format=label_format, dpi=options['dpi'])
 
         headers = [
-            ('Content-Type', 'application/pdf'),
-            ('Content-Length', len(pdf)),
-            ('Content-Disposition', f'inline; filename="label_{tracking_no}.pdf"')
+            ('Content-Type', LABEL_MIMETYPES[label_format]),
+            ('Content-Length', len(label)),
+            ('Content-Disposition', f'inline; filename="label_{tracking_no}.{label_format}"')
         ]
-        return request.make_response(pdf, headers=headers)
\ No newline at end of file
+        return request.make_response(label, headers=headers)
+
+    @http.route('/delivery/print_labels', type='http', auth='user', methods=['GET', 'POST'], csrf=False)
+    def print_labels(self, tracking_nos=None, picking_ids=None, label_format=None, **kw):
+        """Print many labels as a single document or printer job
+
+        Labels are imposed in the sheets of the carrier document model.
+
+        :param str tracking_nos: Comma separated tracking numbers
+        :param str picking_ids: Comma separated picking ids
+        :param str label_format: pdf, png, bmp, zpl or epl. Defaults to the
+            carrier one
+        """
+        if not self._can_print():
+            return request.not_found()
+        Picking = request.env['stock.picking']
+        if tracking_nos:
+            keys = [t.strip() for t in tracking_nos.split(',') if t.strip()]
+            pickings = Picking.search(self._labels_domain([('carrier_tracking_ref', 'in', keys)]))
+            position = {key: index for index, key in enumerate(keys)}
+            pickings = pickings.sorted(lambda p: position[p.carrier_tracking_ref])
+        elif picking_ids:
+            keys = [int(i) for i in picking_ids.split(',') if i.strip().isdigit()]
+            pickings = Picking.search(self._labels_domain([('id', 'in', keys)]))
+            position = {key: index for index, key in enumerate(keys)}
+            pickings = pickings.sorted(lambda p: position[p.id])
+        else:
+            return request.not_found()
+        # Readable by the user: the related orders are read as superuser
+        pickings = pickings.filtered('carrier_tracking_ref').sudo()
+        if not pickings:
+            return request.not_found()
+        options = pickings[0].carrier_id._banlingkit_label_options()
+        options['label_format'] = label_format or options['label_format']
+        if options['label_format'] not in LABEL_MIMETYPES:
+            return request.not_found()
+
+        stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        render_labels(pickings, stream, **options)
+        size = stream.tell()
+        stream.seek(0)
+        mimetype, extension = labels_document_type(options['label_format'])
+        headers = [
+            ('Content-Type', mimetype),
+            ('Content-Length', size),
+            ('Content-Disposition', f'inline; filename="labels.{extension}"'),
+        ]
+        return Response(
+            wrap_file(request.httprequest.environ, stream),
+            headers=headers,
+            direct_passthrough=True,
+        )
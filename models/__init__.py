@@ -1,2 +1,6 @@
+from . import banlingkit_queue
 from . import delivery_carrier
 from . import stock_picking
+from . import banlingkit_shipment_job
+from . import banlingkit_tracking_event
+from . import banlingkit_tracking_push
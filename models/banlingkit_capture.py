@@ -0,0 +1,218 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+# Secrets never written in captures nor in the request logs
+REDACTED_KEYS = frozenset(["salt", "signature", "Authorization"])
+REDACTED = "***"
+# Consignee personal data, not kept in the capture files
+PERSONAL_KEYS = frozenset(["consignee", "tel", "email", "detail", "postCode", "city"])
+# Bigger binary responses (labels) are captured without content
+CAPTURE_MAX_CONTENT = 256 * 1024
+
+
+def redact(values):
+    """Copy of a headers or params dict with the secrets hidden
+
+    :param dict values: Headers or params
+    :return dict: Redacted values
+    """
+    if not isinstance(values, dict):
+        return values
+    return {
+        key: REDACTED if key in REDACTED_KEYS else value
+        for key, value in values.items()
+    }
+
+
+def redact_personal(payload):
+    """Copy of a shippings payload with the consignee personal data hidden
+
+    :param payload: Shipping values dict or list of them
+    :return: Redacted payload
+    """
+    if isinstance(payload, list):
+        return [redact_personal(values) for values in payload]
+    if not isinstance(payload, dict):
+        return payload
+    return {
+        key: REDACTED if key in PERSONAL_KEYS and value else value
+        for key, value in payload.items()
+    }
+
+
+def capture_record(operation, method, url, kwargs, response, body, latency):
+    """Compact, redacted representation of a request/response pair
+
+    :param str operation: Operation name
+    :param str method: HTTP method
+    :param str url: Request url
+    :param dict kwargs: Request keyword arguments
+    :param requests.Response response: API response
+    :param body: Decoded JSON response body
+    :param float latency: Elapsed seconds
+    :return dict: Capture record
+    """
+    content = None
+    if body is None and not kwargs.get("stream"):
+        raw = response.content or b""
+        if len(raw) <= CAPTURE_MAX_CONTENT:
+            content = base64.b64encode(raw).decode()
+    return {
+        "ts": time.time(),
+        "operation": operation,
+        "method": method,
+        "url": url,
+        "headers": redact(kwargs.get("headers")),
+        "params": redact(kwargs.get("params")),
+        "json": kwargs.get("json"),
+        "data": kwargs.get("data"),
+        "latency": latency,
+        "status": response.status_code,
+        "content_type": response.headers.get("Content-Type", ""),
+        "body": body,
+        "content": content,
+    }
+
+
+class CaptureWriter:
+    """Append capture records to a gzipped JSON lines file of this worker
+
+    Each process writes its own file, so no locking between workers is
+    needed. The consignee personal data of the payloads isn't written.
+
+    :param str directory: Captures directory
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory,
+            "banlingkit-{}-{}.jsonl.gz".format(time.strftime("%Y%m%d"), os.getpid()),
+        )
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        record = dict(record, json=redact_personal(record.get("json")))
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as capture:
+            capture.write(line)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(directory):
+    """Capture writer of a directory for this worker
+
+    :param str directory: Captures directory
+    :return CaptureWriter: Writer
+    """
+    key = (directory, os.getpid())
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = CaptureWriter(directory)
+        return _writers[key]
+
+
+def load_capture(path):
+    """Read the records of a capture file
+
+    :param str path: Capture file path
+    :return generator: Capture records in their recording order
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as capture:
+        for line in capture:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplaySession:
+    """Stand-in of `requests.Session` answering with captured responses
+
+    Responses are matched by method and url path, in their capture order.
+    When a request has no captured answer left, the last one is reused.
+
+    :param iterable records: Capture records
+    :param bool simulate_latency: Wait the captured latency before answering
+    """
+
+    def __init__(self, records, simulate_latency=False):
+        self.simulate_latency = simulate_latency
+        self._responses = defaultdict(deque)
+        self._last = {}
+        self._lock = threading.Lock()
+        for record in records:
+            key = (record["method"], urlparse(record["url"]).path)
+            self._responses[key].append(record)
+
+    def _next(self, key):
+        with self._lock:
+            queue = self._responses.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            return self._last.get(key)
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        record = self._next((method, urlparse(url).path))
+        prepared = requests.Request(
+            method,
+            url,
+            headers=kwargs.get("headers"),
+            params=kwargs.get("params"),
+            json=kwargs.get("json"),
+            data=kwargs.get("data"),
+        ).prepare()
+        response = requests.models.Response()
+        response.request = prepared
+        response.url = prepared.url
+        response._content_consumed = True
+        if not record:
+            response.status_code = 404
+            response._content = b""
+            return response
+        if self.simulate_latency:
+            time.sleep(record.get("latency") or 0.0)
+        response.status_code = record["status"]
+        response.headers["Content-Type"] = record.get("content_type", "")
+        if record.get("body") is not None:
+            response._content = json.dumps(record["body"]).encode()
+        else:
+            response._content = base64.b64decode(record.get("content") or "")
+        return response
+
+    def close(self):
+        return
+
+
+def replay(records, send, speed=0.0):
+    """Feed captured requests again keeping their relative timing
+
+    :param iterable records: Capture records
+    :param callable send: Called with every record
+    :param float speed: Timing factor. 1 is the captured pace, 2 twice as
+        fast, and 0 sends them as fast as possible.
+    :return tuple: (sent requests, elapsed seconds)
+    """
+    start = time.monotonic()
+    first_ts = None
+    count = 0
+    for record in records:
+        if speed and first_ts is None:
+            first_ts = record["ts"]
+        if speed:
+            delay = (record["ts"] - first_ts) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        send(record)
+        count += 1
+    return count, time.monotonic() - start
@@ -0,0 +1,161 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_LATENCY_THRESHOLD = 10.0
+BREAKER_RESET_TIMEOUT = 30.0
+# The open period doubles on every failed probe up to this limit
+BREAKER_MAX_RESET_TIMEOUT = 600.0
+
+
+class BanlingkitCircuitOpenError(Exception):
+    """The endpoint is failing, so the call isn't even tried"""
+
+
+class CircuitBreaker:
+    """Circuit breaker of an account endpoint in the current worker
+
+    It opens after `failure_threshold` consecutive failures (slow calls
+    count as failures) and rejects calls while open. Once the reset timeout
+    has elapsed a single probe call is let through: if it succeeds the
+    circuit closes, otherwise it opens again for twice the time.
+
+    :param str key: Breaker identifier (account and endpoint)
+    :param int failure_threshold: Consecutive failures that open the circuit
+    :param float latency_threshold: Seconds after which a call is a failure
+    :param float reset_timeout: Seconds the circuit stays open at first
+    """
+
+    def __init__(
+        self,
+        key,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        latency_threshold=BREAKER_LATENCY_THRESHOLD,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+    ):
+        self.key = key
+        self.failure_threshold = max(failure_threshold, 1)
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_timeout = reset_timeout
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Check whether a call can be done
+
+        :raises BanlingkitCircuitOpenError: When the circuit is open
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_timeout:
+                    raise BanlingkitCircuitOpenError(
+                        "Banlingkit endpoint unavailable: {}".format(self.key)
+                    )
+                self.state = HALF_OPEN
+            # Half open: only one probe at a time
+            if self._probing:
+                raise BanlingkitCircuitOpenError(
+                    "Banlingkit endpoint being probed: {}".format(self.key)
+                )
+            self._probing = True
+
+    def release(self):
+        """Give up a call let through without registering any outcome
+
+        A probe that didn't reach the endpoint leaves the circuit half open,
+        so the next call probes it.
+        """
+        with self._lock:
+            self._probing = False
+
+    def after_call(self, success, latency):
+        """Register the call outcome
+
+        :param bool success: The endpoint answered properly
+        :param float latency: Elapsed seconds
+        """
+        if self.latency_threshold and latency > self.latency_threshold:
+            success = False
+        with self._lock:
+            probing, self._probing = self._probing, False
+            if success:
+                self.state = CLOSED
+                self.failures = 0
+                self.open_timeout = self.reset_timeout
+                return
+            self.failures += 1
+            if probing:
+                self.open_timeout = min(self.open_timeout * 2, BREAKER_MAX_RESET_TIMEOUT)
+            if probing or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def to_dict(self):
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(
+                    self.open_timeout - (time.monotonic() - self.opened_at), 0.0
+                )
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": retry_in,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(account, endpoint, **settings):
+    """Breaker of an account endpoint, shared by the worker threads
+
+    :param str account: API client id
+    :param str endpoint: Operation name
+    :return CircuitBreaker: Breaker
+    """
+    key = (account or "", endpoint)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(
+                "{}:{}".format(account or "", endpoint), **settings
+            )
+        else:
+            # Settings can change in the carrier at any moment
+            breaker.failure_threshold = max(
+                settings.get("failure_threshold", breaker.failure_threshold), 1
+            )
+            breaker.latency_threshold = settings.get(
+                "latency_threshold", breaker.latency_threshold
+            )
+            breaker.reset_timeout = settings.get("reset_timeout", breaker.reset_timeout)
+    return breaker
+
+
+def breakers_snapshot(account=None):
+    """Current state of the breakers grouped by account and endpoint
+
+    :param str account: Only return this account breakers
+    :return dict: {account: {endpoint: state}}
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    result = {}
+    for (key_account, endpoint), breaker in breakers:
+        if account is not None and key_account != account:
+            continue
+        result.setdefault(key_account, {})[endpoint] = breaker.to_dict()
+    return result
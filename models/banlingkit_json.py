@@ -0,0 +1,69 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def _stdlib_dumps(value):
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False, default=str
+    ).encode("utf-8")
+
+
+def _orjson_dumps(value):
+    import orjson
+
+    return orjson.dumps(value, default=str)
+
+
+# Encoders turn a value into compact UTF-8 JSON bytes. Other modules can
+# add theirs with `register_json_encoder`.
+JSON_ENCODERS = {
+    "json": _stdlib_dumps,
+    "orjson": _orjson_dumps,
+}
+# Tried in this order by the "auto" encoder
+JSON_ENCODERS_PREFERENCE = ["orjson", "json"]
+_available = {}
+
+
+def register_json_encoder(name, dumps, preferred=False):
+    """Make a JSON encoder available to the request objects
+
+    :param str name: Encoder name, used in the ``banlingkit_json_encoder``
+        server option
+    :param callable dumps: Takes a value and returns JSON bytes
+    :param bool preferred: Try it first when the encoder is "auto"
+    """
+    JSON_ENCODERS[name] = dumps
+    _available.pop(name, None)
+    if preferred:
+        JSON_ENCODERS_PREFERENCE.insert(0, name)
+
+
+def _is_available(name):
+    if name not in _available:
+        try:
+            JSON_ENCODERS[name]({})
+            _available[name] = True
+        except Exception:
+            _available[name] = False
+    return _available[name]
+
+
+def get_json_encoder(name=None):
+    """Encoder to serialize the request bodies
+
+    :param str name: Encoder name. Empty or "auto" picks the first available
+        one of the preference list.
+    :return callable: Takes a value and returns JSON bytes
+    """
+    if name and name != "auto":
+        if name in JSON_ENCODERS and _is_available(name):
+            return JSON_ENCODERS[name]
+        _logger.warning("Banlingkit JSON encoder %s not available", name)
+    for candidate in JSON_ENCODERS_PREFERENCE:
+        if candidate in JSON_ENCODERS and _is_available(candidate):
+            return JSON_ENCODERS[candidate]
+    return _stdlib_dumps
@@ -0,0 +1,435 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import io
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+
+from .banlingkit_label_text import LABEL_DPI, TEXT_RENDERERS
+from .banlingkit_metrics import metrics
+
+# reportlab is only imported when a label is drawn, so its unit is
+# defined here (same value as `reportlab.lib.units.mm`)
+mm = 72 / 25.4
+
+FONT_NAME = "Microsoft_YaHei"
+FONT_PATH = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), "..", "static", "fonts", "Microsoft_YaHei.ttf"
+    )
+)
+# 横向：宽150mm，高80mm
+LABEL_WIDTH = 150 * mm
+LABEL_HEIGHT = 80 * mm
+# Pickings loaded at once when rendering many labels. Bounds the ORM cache.
+LABEL_BATCH_SIZE = 200
+# Rendered labels kept in memory per worker for reprints
+LABEL_CACHE_SIZE = 512
+# Formats the labels can be rendered in locally
+LABEL_MIMETYPES = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "bmp": "image/bmp",
+    "zpl": "text/plain",
+    "epl": "text/plain",
+}
+A4 = (210 * mm, 297 * mm)
+# Sheets of the document models: (page size, columns, rows). Labels are
+# shrunk when they don't fit in their cell.
+SHEET_MODELS = {
+    "SINGLE": ((LABEL_WIDTH, LABEL_HEIGHT), 1, 1),
+    "MULTI1": (A4, 1, 1),
+    "MULTI3": (A4, 1, 3),
+    "MULTI4": ((A4[1], A4[0]), 2, 2),
+}
+
+# Fixed label geometry, computed once per worker
+LAYOUT = {}
+LAYOUT["top"] = LABEL_HEIGHT - 8 * mm  # 顶部距离页面上边缘 8mm
+LAYOUT["barcode_height"] = 15 * mm
+LAYOUT["barcode_y"] = LAYOUT["top"] - 6 * mm - 15 * mm  # 面单号下方，条码高度15mm
+LAYOUT["line_gap"] = 7 * mm
+LAYOUT["content_top"] = LAYOUT["barcode_y"] - 10 * mm  # 条码下方再空10mm开始内容
+LAYOUT["products_top"] = LAYOUT["content_top"] - 4 * LAYOUT["line_gap"]
+LAYOUT["product_gap"] = 3.5 * mm  # 更小的行距
+LAYOUT["bottom"] = 15 * mm  # 保证不与底部内容重叠
+LAYOUT["margin"] = 3 * mm
+LAYOUT["indent"] = 8 * mm
+
+_font_registered = False
+_font_lock = threading.Lock()
+
+
+def register_font():
+    """Register the label font in reportlab once per worker"""
+    global _font_registered
+    if _font_registered:
+        return
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    with _font_lock:
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+        _font_registered = True
+
+
+def get_barcode(tracking_no):
+    """Code128 barcode for a tracking number
+
+    A new one is built for every label: reportlab barcodes keep the canvas
+    they're drawn on, so they can't be shared by the worker threads.
+
+    :param str tracking_no: Shipping code
+    :return code128.Code128: Barcode flowable
+    """
+    from reportlab.graphics.barcode import code128
+
+    return code128.Code128(
+        tracking_no, barHeight=LAYOUT["barcode_height"], barWidth=1.2
+    )
+
+
+class LabelCache:
+    """Bounded LRU of rendered labels shared by the worker threads"""
+
+    def __init__(self, size=LABEL_CACHE_SIZE):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+label_cache = LabelCache()
+
+
+def label_cache_key(values):
+    """Cache key of a label
+
+    It's made of the printed values, so the label is rendered again only
+    when something printed in it changes. Other changes of the order, like
+    its shipping time, don't spoil the cached label.
+
+    :param dict values: Label values given by `label_values`
+    :return tuple: Cache key
+    """
+    return tuple(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in sorted(values.items())
+        # Reprints keep the print time of the first rendering
+        if name != "print_time"
+    )
+
+
+def label_values(picking, tracking_no=None):
+    """Gather the values printed in the label of a picking
+
+    :param record picking: `stock.picking` record with a sale order
+    :param str tracking_no: Shipping code. Defaults to the picking one
+    :return dict: Label values
+    """
+    order = picking.sale_id
+    partner = order.partner_shipping_id or order.partner_id
+    lines = []
+    for line in order.order_line:
+        # 获取变体值字符串
+        variant = ""
+        attribute_values = line.product_id.product_template_attribute_value_ids
+        if attribute_values:
+            variant = " [" + ", ".join(v.name for v in attribute_values) + "]"
+        lines.append(
+            f"{line.product_id.display_name}{variant} x {line.product_uom_qty}"
+        )
+    return {
+        "tracking_no": tracking_no or picking.carrier_tracking_ref,
+        "name": partner.name or "",
+        "country": partner.country_id.name if partner.country_id else "",
+        "region": partner.state_id.name if partner.state_id else "",
+        "city": partner.city or "",
+        "address": partner.contact_address or "",
+        "phone": partner.phone or "",
+        "lines": lines,
+        # 获取当前打印时间
+        "print_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def draw_label(c, values, width=LABEL_WIDTH, height=LABEL_HEIGHT):
+    """Draw a label in the current page of a reportlab canvas
+
+    :param canvas.Canvas c: Canvas to draw in
+    :param dict values: Label values given by `label_values`
+    :param float width: Page width
+    :param float height: Page height
+    """
+    tracking_no = values["tracking_no"]
+    margin, indent = LAYOUT["margin"], LAYOUT["indent"]
+    # The layout is computed for the standard label height
+    offset = height - LABEL_HEIGHT
+
+    c.setFont(FONT_NAME, 12)
+    c.drawString(margin, LAYOUT["top"] + offset, f"面单号: {tracking_no}")
+
+    # 生成一维码，紧跟在面单号下方
+    barcode = get_barcode(tracking_no)
+    x = (width - barcode.width) / 2  # 居中
+    barcode.drawOn(c, x, LAYOUT["barcode_y"] + offset)
+
+    # 继续绘制其他内容
+    line_gap = LAYOUT["line_gap"]
+    content_top = LAYOUT["content_top"] + offset
+    c.setFont(FONT_NAME, 10)
+    c.drawString(margin, content_top, f"收件人/国家: {values['name']} {values['country']}")
+    c.drawString(
+        margin, content_top - line_gap, f"省份/城市: {values['region']} {values['city']}"
+    )
+    c.drawString(margin, content_top - 2 * line_gap, f"地址: {values['address']}")
+    c.drawString(margin, content_top - 3 * line_gap, f"打印时间: {values['print_time']}")
+
+    # 商品内容
+    y = LAYOUT["products_top"] + offset
+    c.drawString(margin, y, "商品列表:")
+    y -= LAYOUT["product_gap"]
+    for product_str in values["lines"]:
+        c.drawString(indent, y, product_str)
+        y -= LAYOUT["product_gap"]
+        if y < LAYOUT["bottom"] + offset:
+            c.drawString(indent, y, "...")
+            break
+
+
+def sheet_slots(model_code):
+    """Positions of the labels in a sheet, in filling order
+
+    :param str model_code: SINGLE, MULTI1, MULTI3 or MULTI4
+    :return tuple: (page size, [(x, y, scale)]) with the bottom left corner
+        of every label
+    """
+    pagesize, columns, rows = SHEET_MODELS.get(model_code) or SHEET_MODELS["SINGLE"]
+    cell_width, cell_height = pagesize[0] / columns, pagesize[1] / rows
+    scale = min(1.0, cell_width / LABEL_WIDTH, cell_height / LABEL_HEIGHT)
+    slots = []
+    for row in range(rows):
+        for column in range(columns):
+            slots.append(
+                (
+                    column * cell_width + (cell_width - LABEL_WIDTH * scale) / 2,
+                    pagesize[1]
+                    - (row + 1) * cell_height
+                    + (cell_height - LABEL_HEIGHT * scale) / 2,
+                    scale,
+                )
+            )
+    return pagesize, slots
+
+
+def draw_label_in_slot(c, values, slot):
+    """Draw a label in a sheet position
+
+    :param canvas.Canvas c: Canvas to draw in
+    :param dict values: Label values given by `label_values`
+    :param tuple slot: (x, y, scale) given by `sheet_slots`
+    """
+    x, y, scale = slot
+    c.saveState()
+    c.translate(x, y)
+    c.scale(scale, scale)
+    draw_label(c, values)
+    c.restoreState()
+
+
+def labels_document_type(label_format):
+    """Content type of the documents given by `render_labels`
+
+    :param str label_format: Label format
+    :return tuple: (mimetype, file extension)
+    """
+    if label_format in ("png", "bmp"):
+        # One image per sheet
+        return "application/zip", "zip"
+    return LABEL_MIMETYPES[label_format], label_format
+
+
+def render_label(
+    picking, tracking_no=None, use_cache=True, label_format="pdf", dpi=LABEL_DPI
+):
+    """Render the label of a picking in memory
+
+    Reprints of an unchanged label are served from the worker cache, so
+    they keep the print time of the first rendering.
+
+    :param record picking: `stock.picking` record with a sale order
+    :param str tracking_no: Shipping code. Defaults to the picking one
+    :param bool use_cache: Look up and store the label in the cache
+    :param str label_format: pdf, png, bmp, or zpl and epl for thermal
+        printers
+    :param int dpi: Resolution of the images and thermal printers
+    :return bytes: Label content
+    """
+    operation = "render_label"
+    if label_format != "pdf":
+        operation += "_" + label_format
+    with metrics.measure("local", operation) as values:
+        printed = label_values(picking, tracking_no)
+        key = None
+        if use_cache:
+            key = label_cache_key(printed) + (label_format, dpi)
+        label = label_cache.get(key) if key else None
+        if label is None:
+            if label_format in TEXT_RENDERERS:
+                label = TEXT_RENDERERS[label_format](printed, dpi)
+            elif label_format in ("png", "bmp"):
+                from .banlingkit_label_raster import ImageCanvas
+
+                images = []
+                c = ImageCanvas(
+                    (LABEL_WIDTH, LABEL_HEIGHT), dpi, label_format, images.append
+                )
+                draw_label(c, printed)
+                c.save()
+                label = images[0]
+            else:
+                from reportlab.pdfgen import canvas
+
+                register_font()
+                buffer = io.BytesIO()
+                c = canvas.Canvas(buffer, pagesize=(LABEL_WIDTH, LABEL_HEIGHT))
+                draw_label(c, printed)
+                c.showPage()
+                c.save()
+                label = buffer.getvalue()
+            values["code"] = "rendered"
+            if key:
+                label_cache.set(key, label)
+        else:
+            values["code"] = "cached"
+        values.update(response_bytes=len(label), status=200)
+    return label
+
+
+def prefetch_label_values(pickings):
+    """Load every record printed in the labels in a few queries
+
+    :param recordset pickings: `stock.picking` recordset
+    :return list: Loaded recordsets, to drop them from the cache afterwards
+    """
+    orders = pickings.mapped("sale_id")
+    partners = orders.mapped("partner_shipping_id") | orders.mapped("partner_id")
+    partners.mapped("country_id.name")
+    partners.mapped("state_id.name")
+    lines = orders.mapped("order_line")
+    products = lines.mapped("product_id")
+    attribute_values = products.mapped("product_template_attribute_value_ids")
+    attribute_values.mapped("name")
+    products.mapped("display_name")
+    return [
+        orders,
+        partners,
+        lines,
+        products,
+        products.mapped("product_tmpl_id"),
+        attribute_values,
+    ]
+
+
+def render_labels(
+    pickings,
+    stream,
+    batch_size=LABEL_BATCH_SIZE,
+    label_format="pdf",
+    model_code="SINGLE",
+    offset=0,
+    dpi=LABEL_DPI,
+):
+    """Render the labels of many pickings in a single document
+
+    PDF labels are imposed in the sheets of the document model, so a whole
+    wave is a single print job. PNG and BMP sheets are images in a zip
+    archive. ZPL and EPL labels are concatenated for the thermal printer.
+
+    Pickings are processed in batches. Each batch and its orders,
+    partners, lines and products are prefetched together and dropped from
+    the cache once drawn, so the ORM cache doesn't grow with the wave.
+    Thermal labels and images are written as they're drawn, but reportlab
+    keeps the PDF pages until the document is saved.
+
+    :param recordset pickings: `stock.picking` recordset, in printing order
+    :param file stream: Binary file object where the document is written
+    :param int batch_size: Pickings loaded at once
+    :param str label_format: pdf, png, bmp, or zpl and epl for thermal
+        printers
+    :param str model_code: Document model: SINGLE, MULTI1, MULTI3 or MULTI4
+    :param int offset: Positions already used in the first sheet
+    :param int dpi: Resolution of the images and thermal printers
+    :return int: Number of labels rendered
+    """
+    with metrics.measure("local", "render_labels") as values:
+        text_renderer = TEXT_RENDERERS.get(label_format)
+        archive = None
+        if not text_renderer:
+            pagesize, slots = sheet_slots(model_code)
+            position = (offset or 0) % len(slots)
+            if label_format in ("png", "bmp"):
+                from .banlingkit_label_raster import ImageCanvas
+
+                compression = zipfile.ZIP_DEFLATED
+                if label_format == "png":
+                    compression = zipfile.ZIP_STORED
+                archive = zipfile.ZipFile(stream, "w", compression)
+
+                def write_sheet(image):
+                    archive.writestr(
+                        "labels-{:04d}.{}".format(c.pages + 1, label_format), image
+                    )
+
+                c = ImageCanvas(pagesize, dpi, label_format, write_sheet)
+            else:
+                from reportlab.pdfgen import canvas
+
+                # Images are drawn by PIL, only PDFs need the reportlab font
+                register_font()
+                c = canvas.Canvas(stream, pagesize=pagesize)
+        labels = 0
+        for index in range(0, len(pickings), batch_size):
+            batch = pickings[index : index + batch_size]
+            loaded = prefetch_label_values(batch)
+            for picking in batch.filtered("sale_id"):
+                if text_renderer:
+                    stream.write(text_renderer(label_values(picking), dpi))
+                    labels += 1
+                    continue
+                if position == len(slots):
+                    c.showPage()
+                    position = 0
+                draw_label_in_slot(c, label_values(picking), slots[position])
+                position += 1
+                labels += 1
+            batch.invalidate_recordset()
+            for records in loaded:
+                records.invalidate_recordset()
+        if not text_renderer:
+            if labels:
+                c.showPage()
+            c.save()
+        if archive:
+            archive.close()
+        values.update(response_bytes=stream.tell(), status=200)
+    return labels
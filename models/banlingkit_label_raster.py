@@ -0,0 +1,123 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import io
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .banlingkit_label import FONT_PATH
+
+# PIL image formats of the raster label formats
+RASTER_FORMATS = {
+    "png": "PNG",
+    "bmp": "BMP",
+}
+POINTS_PER_INCH = 72.0
+
+
+@lru_cache(maxsize=32)
+def get_font(size):
+    """Label font at a pixel size, loaded once per worker
+
+    :param int size: Font size in pixels
+    :return ImageFont.FreeTypeFont: Font
+    """
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+class ImageCanvas:
+    """The part of the reportlab canvas used by the labels, drawing on an image
+
+    It lets `draw_label` and the sheets imposition render bitmaps without a
+    reportlab raster backend. A single 1-bit image is reused for every
+    page: `showPage` encodes it, hands it to `on_page` and clears it.
+
+    :param tuple pagesize: (width, height) in points
+    :param int dpi: Image resolution
+    :param str label_format: png or bmp
+    :param callable on_page: Called with every encoded page
+    """
+
+    def __init__(self, pagesize, dpi, label_format, on_page):
+        self.ratio = dpi / POINTS_PER_INCH
+        self.size = (
+            int(round(pagesize[0] * self.ratio)),
+            int(round(pagesize[1] * self.ratio)),
+        )
+        self.dpi = dpi
+        self.image_format = RASTER_FORMATS[label_format]
+        self.on_page = on_page
+        self.image = Image.new("1", self.size, 1)
+        self.draw = ImageDraw.Draw(self.image)
+        self.pages = 0
+        self._font = None
+        self._dirty = False
+        # Current transformation: origin in points and uniform scale
+        self._state = (0.0, 0.0, 1.0)
+        self._states = []
+
+    def _point(self, x, y):
+        origin_x, origin_y, scale = self._state
+        return (
+            (origin_x + x * scale) * self.ratio,
+            self.size[1] - (origin_y + y * scale) * self.ratio,
+        )
+
+    def saveState(self):
+        self._states.append(self._state)
+
+    def restoreState(self):
+        self._state = self._states.pop()
+
+    def translate(self, dx, dy):
+        origin_x, origin_y, scale = self._state
+        self._state = (origin_x + dx * scale, origin_y + dy * scale, scale)
+
+    def scale(self, x, y):
+        origin_x, origin_y, scale = self._state
+        self._state = (origin_x, origin_y, scale * x)
+
+    def setFont(self, name, size):
+        pixels = size * self._state[2] * self.ratio
+        self._font = get_font(max(int(round(pixels)), 1))
+
+    def setFillColor(self, *args, **kwargs):
+        return
+
+    def setStrokeColor(self, *args, **kwargs):
+        return
+
+    def setLineWidth(self, *args, **kwargs):
+        return
+
+    def drawString(self, x, y, text):
+        self.draw.text(self._point(x, y), text, font=self._font, fill=0, anchor="ls")
+        self._dirty = True
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        left, bottom = self._point(x, y)
+        right, top = self._point(x + width, y + height)
+        self.draw.rectangle(
+            [
+                int(round(left)),
+                int(round(top)),
+                max(int(round(right)) - 1, int(round(left))),
+                max(int(round(bottom)) - 1, int(round(top))),
+            ],
+            fill=0 if fill else None,
+            outline=0 if stroke else None,
+        )
+        self._dirty = True
+
+    def showPage(self):
+        buffer = io.BytesIO()
+        self.image.save(buffer, self.image_format, dpi=(self.dpi, self.dpi))
+        self.on_page(buffer.getvalue())
+        self.pages += 1
+        self.draw.rectangle([(0, 0), self.size], fill=1)
+        self._dirty = False
+        self._state = (0.0, 0.0, 1.0)
+        self._states = []
+
+    def save(self):
+        if self._dirty:
+            self.showPage()
@@ -0,0 +1,192 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""ZPL and EPL versions of the 150x80 mm label for thermal printers
+
+The printer draws the text and the Code128 barcode itself, so a label is a
+few hundred bytes of commands instead of a rasterized PDF page. The layout
+is the same as the PDF one (see `banlingkit_label.LAYOUT`), measured in mm
+from the top left corner as printers do.
+"""
+
+# Most thermal printers print at 8 dots per mm
+LABEL_DPI = 203
+LABEL_WIDTH_MM = 150
+LABEL_HEIGHT_MM = 80
+# Baselines, from the top edge
+TRACKING_Y_MM = 8
+BARCODE_Y_MM = 14
+BARCODE_HEIGHT_MM = 15
+CONTENT_Y_MM = 39
+LINE_GAP_MM = 7
+PRODUCTS_Y_MM = CONTENT_Y_MM + 4 * LINE_GAP_MM
+PRODUCT_GAP_MM = 3.5
+BOTTOM_Y_MM = LABEL_HEIGHT_MM - 15
+MARGIN_MM = 3
+INDENT_MM = 8
+# Character heights for the 12 and 10 points fonts of the PDF label
+TITLE_FONT_MM = 4.2
+TEXT_FONT_MM = 3.5
+# Code128 module width in dots (~1.2 points at 203 dpi)
+BARCODE_MODULE = 3
+# The captions are Chinese, so ZPL printers need a Unicode TTF font. The
+# module one (static/fonts/Microsoft_YaHei.ttf) can be downloaded to the
+# printer with this name. Otherwise the printer resident font 0 is used.
+ZPL_FONT = "E:MSYH.TTF"
+# EPL resident font. EPL has no Unicode support, so non latin text needs an
+# Asian font loaded in the printer.
+EPL_FONT = "3"
+
+
+def _dots(value_mm, dpi):
+    return int(round(value_mm * dpi / 25.4))
+
+
+def _label_rows(values):
+    """Text rows of the label with their baseline and size
+
+    :param dict values: Label values given by `label_values`
+    :return list: [(x mm, baseline mm, font height mm, text)]
+    """
+    rows = [
+        (MARGIN_MM, TRACKING_Y_MM, TITLE_FONT_MM, f"面单号: {values['tracking_no']}"),
+        (
+            MARGIN_MM,
+            CONTENT_Y_MM,
+            TEXT_FONT_MM,
+            f"收件人/国家: {values['name']} {values['country']}",
+        ),
+        (
+            MARGIN_MM,
+            CONTENT_Y_MM + LINE_GAP_MM,
+            TEXT_FONT_MM,
+            f"省份/城市: {values['region']} {values['city']}",
+        ),
+        (
+            MARGIN_MM,
+            CONTENT_Y_MM + 2 * LINE_GAP_MM,
+            TEXT_FONT_MM,
+            f"地址: {values['address']}",
+        ),
+        (
+            MARGIN_MM,
+            CONTENT_Y_MM + 3 * LINE_GAP_MM,
+            TEXT_FONT_MM,
+            f"打印时间: {values['print_time']}",
+        ),
+        (MARGIN_MM, PRODUCTS_Y_MM, TEXT_FONT_MM, "商品列表:"),
+    ]
+    # Same truncation as the PDF label
+    y = PRODUCTS_Y_MM + PRODUCT_GAP_MM
+    for product_str in values["lines"]:
+        rows.append((INDENT_MM, y, TEXT_FONT_MM, product_str))
+        y += PRODUCT_GAP_MM
+        if y > BOTTOM_Y_MM:
+            rows.append((INDENT_MM, y, TEXT_FONT_MM, "..."))
+            break
+    return rows
+
+
+def _barcode_x(tracking_no, dpi):
+    """Left position that centers the Code128 barcode (subset B)
+
+    :param str tracking_no: Barcode data
+    :param int dpi: Printer resolution
+    :return int: Dots from the left edge
+    """
+    # Start, data and check symbols are 11 modules wide, the stop one 13
+    width = (11 * (len(tracking_no) + 2) + 13) * BARCODE_MODULE
+    return max((_dots(LABEL_WIDTH_MM, dpi) - width) // 2, _dots(MARGIN_MM, dpi))
+
+
+def _zpl_field(text):
+    # Field data is given as hex escaped (^FH) so ^ and ~ can't break it
+    return (
+        "^FH_^FD"
+        + text.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+        + "^FS"
+    )
+
+
+def render_zpl(values, dpi=LABEL_DPI):
+    """ZPL II commands of a label
+
+    :param dict values: Label values given by `label_values`
+    :param int dpi: Printer resolution
+    :return bytes: UTF-8 encoded commands
+    """
+    tracking_no = values["tracking_no"]
+    commands = [
+        "^XA^CI28^CF0",
+        "^PW{}^LL{}^LH0,0".format(
+            _dots(LABEL_WIDTH_MM, dpi), _dots(LABEL_HEIGHT_MM, dpi)
+        ),
+    ]
+    for x, baseline, size, text in _label_rows(values):
+        height = _dots(size, dpi)
+        commands.append(
+            "^FO{},{}^A@N,{},{},{}{}".format(
+                _dots(x, dpi),
+                _dots(baseline - size, dpi),
+                height,
+                height,
+                ZPL_FONT,
+                _zpl_field(text),
+            )
+        )
+    commands.append(
+        "^FO{},{}^BY{}^BCN,{},N,N,N{}".format(
+            _barcode_x(tracking_no, dpi),
+            _dots(BARCODE_Y_MM, dpi),
+            BARCODE_MODULE,
+            _dots(BARCODE_HEIGHT_MM, dpi),
+            _zpl_field(tracking_no),
+        )
+    )
+    commands.append("^XZ\n")
+    return "\n".join(commands).encode("utf-8")
+
+
+def _epl_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def render_epl(values, dpi=LABEL_DPI):
+    """EPL2 commands of a label
+
+    :param dict values: Label values given by `label_values`
+    :param int dpi: Printer resolution
+    :return bytes: UTF-8 encoded commands
+    """
+    tracking_no = values["tracking_no"]
+    commands = [
+        "",
+        "N",
+        "q{}".format(_dots(LABEL_WIDTH_MM, dpi)),
+        "Q{},24".format(_dots(LABEL_HEIGHT_MM, dpi)),
+    ]
+    for x, baseline, size, text in _label_rows(values):
+        commands.append(
+            "A{},{},0,{},1,1,N,{}".format(
+                _dots(x, dpi),
+                _dots(baseline - size, dpi),
+                EPL_FONT,
+                _epl_string(text),
+            )
+        )
+    commands.append(
+        "B{},{},0,1,{},{},{},N,{}".format(
+            _barcode_x(tracking_no, dpi),
+            _dots(BARCODE_Y_MM, dpi),
+            BARCODE_MODULE,
+            BARCODE_MODULE,
+            _dots(BARCODE_HEIGHT_MM, dpi),
+            _epl_string(tracking_no),
+        )
+    )
+    commands.append("P1\n")
+    return "\n".join(commands).encode("utf-8")
+
+
+TEXT_RENDERERS = {
+    "zpl": render_zpl,
+    "epl": render_epl,
+}
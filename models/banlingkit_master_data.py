@@ -0,0 +1,20 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+# Tracking status codes of the Banlingkit tracking API mapped to the
+# `delivery_state` values of the `delivery_state` module.
+BANLINGKIT_DELIVERY_STATES_STATIC = {
+    "0": "shipping_recorded_in_carrier",  # 已下单
+    "1": "in_transit",  # 已揽收
+    "2": "in_transit",  # 运输中
+    "3": "in_transit",  # 派送中
+    "4": "customer_delivered",  # 已签收
+    "5": "incidence",  # 异常
+    "6": "warehouse_delivered",  # 已退回
+    "7": "canceled_shipment",  # 已取消
+}
+# Shippings in these states don't change anymore, so they aren't polled
+BANLINGKIT_FINAL_STATES = (
+    "customer_delivered",
+    "warehouse_delivered",
+    "canceled_shipment",
+)
@@ -0,0 +1,143 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Latency histogram upper bounds in milliseconds
+LATENCY_BUCKETS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+# Latest samples kept per account and operation to compute percentiles
+METRICS_WINDOW = 1024
+
+
+class OperationStats:
+    """Counters and latency histogram of a single account operation"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.count = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = Counter()
+        self.codes = Counter()
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency, request_bytes, response_bytes, status, code, error):
+        self.count += 1
+        self.errors += int(bool(error))
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.statuses[str(status)] += 1
+        if code is not None:
+            self.codes[str(code)] += 1
+        latency_ms = latency * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency_ms <= bound:
+                self.buckets[index] += 1
+                break
+        self.samples.append(latency_ms)
+
+    @staticmethod
+    def _percentile(samples, percent):
+        if not samples:
+            return 0.0
+        index = min(int(round(percent / 100 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+
+    def to_dict(self):
+        samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.count and self.errors / self.count,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "statuses": dict(self.statuses),
+            "codes": dict(self.codes),
+            "histogram": {
+                str(bound): hits for bound, hits in zip(LATENCY_BUCKETS, self.buckets)
+            },
+            "p50_ms": self._percentile(samples, 50),
+            "p95_ms": self._percentile(samples, 95),
+            "p99_ms": self._percentile(samples, 99),
+        }
+
+
+class BanlingkitMetrics:
+    """Per worker registry of Banlingkit operations metrics
+
+    Metrics live in the worker memory, so every Odoo worker reports its own
+    traffic.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        account,
+        operation,
+        latency,
+        request_bytes=0,
+        response_bytes=0,
+        status=None,
+        code=None,
+        error=False,
+    ):
+        """Record a finished operation
+
+        :param str account: API client id (or "local" for local operations)
+        :param str operation: Operation name
+        :param float latency: Elapsed seconds
+        :param int request_bytes: Sent payload size
+        :param int response_bytes: Received payload size
+        :param int status: HTTP status
+        :param code: API response code
+        :param bool error: The operation failed
+        """
+        key = (account or "", operation)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = OperationStats()
+            stats.record(latency, request_bytes, response_bytes, status, code, error)
+
+    @contextmanager
+    def measure(self, account, operation):
+        """Time a block of code. The yielded dict can fill the other values
+
+        :param str account: API client id
+        :param str operation: Operation name
+        """
+        values = {"error": False}
+        start = time.perf_counter()
+        try:
+            yield values
+        except Exception:
+            values["error"] = True
+            raise
+        finally:
+            self.record(account, operation, time.perf_counter() - start, **values)
+
+    def snapshot(self, account=None):
+        """Current metrics grouped by account and operation
+
+        :param str account: Only return this account metrics
+        :return dict: {account: {operation: stats}}
+        """
+        result = {}
+        with self._lock:
+            for (key_account, operation), stats in self._stats.items():
+                if account is not None and key_account != account:
+                    continue
+                result.setdefault(key_account, {})[operation] = stats.to_dict()
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+metrics = BanlingkitMetrics()
@@ -0,0 +1,37 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from odoo import models
+
+
+class BanlingkitQueueMixin(models.AbstractModel):
+    """Queue drained by crons that can run at the same time
+
+    Rows are taken with SKIP LOCKED, so each cron works on its own share and
+    keeps it until its transaction ends.
+    """
+
+    _name = "banlingkit.queue.mixin"
+    _description = "Banlingkit Express queue"
+
+    def _acquire_rows(self, limit, where="TRUE", params=(), order="id"):
+        """Lock the first rows of the queue not locked by another cron
+
+        :param int limit: Maximum rows taken
+        :param str where: SQL condition of the rows taken
+        :param tuple params: Parameters of the condition
+        :param str order: SQL order of the rows
+        :return recordset: Locked records
+        """
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            SELECT id FROM {table}
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """.format(
+                table=self._table, where=where, order=order
+            ),
+            tuple(params) + (limit,),
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
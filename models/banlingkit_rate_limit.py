@@ -0,0 +1,114 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# Buckets state is kept in small files so every Odoo worker of the host
+# shares them. Without fcntl (non POSIX systems) the limit is per process.
+RATE_LIMIT_DIR = os.path.join(tempfile.gettempdir(), "banlingkit_rate_limit")
+
+
+class BanlingkitRateLimitError(Exception):
+    """The call couldn't get a token from the rate limiter in time"""
+
+
+class TokenBucket:
+    """Token bucket shared by the worker processes through a locked file
+
+    :param str key: Bucket identifier (account and endpoint)
+    :param float rate: Tokens added per second
+    :param int burst: Maximum tokens stored
+    """
+
+    def __init__(self, key, rate, burst, directory=RATE_LIMIT_DIR):
+        self.key = key
+        self.rate = rate
+        self.burst = max(burst, 1)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        self.path = os.path.join(directory, digest)
+        self._lock = threading.Lock()
+
+    def _take(self, tokens):
+        """Refill the bucket and try to take the tokens
+
+        :param int tokens: Tokens needed
+        :return float: 0 when taken, otherwise seconds to wait for them
+        """
+        with self._lock, open(self.path, "a+") as state:
+            if fcntl:
+                fcntl.flock(state, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state.seek(0)
+                try:
+                    available, updated = map(float, state.read().split())
+                except ValueError:
+                    available, updated = self.burst, now
+                available = min(self.burst, available + (now - updated) * self.rate)
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+                state.seek(0)
+                state.truncate()
+                state.write("{} {}".format(available, now))
+                state.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(state, fcntl.LOCK_UN)
+        return wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """Take tokens from the bucket, waiting for them if needed
+
+        :param int tokens: Tokens needed
+        :param float timeout: Maximum seconds to wait. 0 fails fast and None
+            waits as long as needed.
+        :raises BanlingkitRateLimitError: When the deadline is reached
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining < wait:
+                    raise BanlingkitRateLimitError(
+                        "Banlingkit rate limit reached for {}".format(self.key)
+                    )
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(account, endpoint, rate, burst):
+    """Bucket of an account endpoint, shared by the worker threads
+
+    :param str account: API client id
+    :param str endpoint: Operation name
+    :param float rate: Requests per second
+    :param int burst: Maximum requests sent at once
+    :return TokenBucket: Bucket
+    """
+    key = (account or "", endpoint, rate, burst)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = _buckets[key] = TokenBucket(
+                    "{}:{}".format(account or "", endpoint), rate, burst
+                )
+    return bucket
@@ -1,12 +1,27 @@
 # Copyright 2022 Tecnativa - David Vidal
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import base64
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from lxml import etree
-import requests
+import gzip
 import hashlib
 import time
 import json
+from datetime import datetime
+
+from .banlingkit_capture import capture_record, get_writer
+from .banlingkit_circuit_breaker import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_LATENCY_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    BanlingkitCircuitOpenError,
+    get_breaker,
+)
+from .banlingkit_json import get_json_encoder
+from .banlingkit_metrics import metrics
+from .banlingkit_rate_limit import BanlingkitRateLimitError, get_bucket
 
 _logger = logging.getLogger(__name__)
 
@@ -15,6 +30,88 @@ BL_API_URL = {
     "prod": "http://admin.banlingkit.com:8012",
 }
 
+# Default connection settings. They can be overridden per carrier.
+BL_CONNECT_TIMEOUT = 5.0
+BL_READ_TIMEOUT = 30.0
+BL_POOL_SIZE = 10
+BL_MAX_RETRIES = 3
+BL_BACKOFF_FACTOR = 0.5
+# Only idempotent calls are retried. Shipment creation (POST) and pickup
+# requests (PUT) are never replayed automatically as they could duplicate
+# the expedition or the pickup.
+BL_RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+BL_RETRY_STATUSES = (429, 502, 503, 504)
+# Shippings packed in a single /invoice/create call in bulk mode
+BL_BULK_CHUNK_SIZE = 100
+# Maximum JSON bytes (before compression) of a bulk request
+BL_BULK_MAX_BYTES = 1024 * 1024
+# Smaller bodies aren't worth compressing
+BL_GZIP_MIN_BYTES = 1024
+BL_GZIP_LEVEL = 6
+# Tracking query. It takes the shipping codes separated by commas.
+BL_TRACKING_PATH = "/tracks/query"
+BL_TRACKING_CHUNK_SIZE = 50
+# Label service. Codes are sent in the query string, so it's chunked.
+BL_LABEL_URL = "https://label.Banlingkit.com/BanlingkitPrint"
+BL_LABEL_CHUNK_SIZE = 50
+BL_LABEL_MAX_QUERY_LENGTH = 1500
+# Bytes read at once when downloading documents
+BL_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Sessions are shared by every request object in the worker process, so
+# connections to the Banlingkit hosts are kept alive between pickings.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(pool_size=BL_POOL_SIZE, max_retries=BL_MAX_RETRIES):
+    """Get the pooled keep-alive session for the given pool configuration
+
+    :param int pool_size: Maximum connections kept alive per host
+    :param int max_retries: Retries for idempotent calls
+    :return requests.Session: Session shared by the whole worker
+    """
+    key = (pool_size, max_retries)
+    session = _sessions.get(key)
+    if session:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session:
+            return session
+        # Imported on the first call, so workers that never talk to
+        # Banlingkit don't pay for them
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=BL_BACKOFF_FACTOR,
+            status_forcelist=BL_RETRY_STATUSES,
+            allowed_methods=BL_RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    """Close every pooled session of this worker (e.g.: after a fork)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
 
 class BanlingkitExpressRequest:
     """Interface between Banlingkit Express SOAP API and Odoo recordset.
@@ -24,17 +121,159 @@ class BanlingkitExpressRequest:
     salt = False
     
 
-    def __init__(self, api_cid, api_salt, prod=False):
+    def __init__(
+        self,
+        api_cid,
+        api_salt,
+        prod=False,
+        connect_timeout=BL_CONNECT_TIMEOUT,
+        read_timeout=BL_READ_TIMEOUT,
+        pool_size=BL_POOL_SIZE,
+        max_retries=BL_MAX_RETRIES,
+        rate_limits=None,
+        rate_limit_wait=None,
+        breaker_threshold=BREAKER_FAILURE_THRESHOLD,
+        breaker_latency=BREAKER_LATENCY_THRESHOLD,
+        breaker_reset=BREAKER_RESET_TIMEOUT,
+        capture_dir=None,
+        json_encoder=None,
+        compress=False,
+        bulk_max_bytes=BL_BULK_MAX_BYTES,
+        debug=False,
+    ):
         self.cid = api_cid
         self.salt = api_salt
-        # We'll store raw xml request/responses in this properties
-        self.bl_last_request = False
-        self.bl_last_response = False
+        # Keep the last request/response pair to log it
+        self.debug = debug
+        # The object is shared by the worker threads, so each one keeps its
+        # own last pair. It's serialized only when read.
+        self._local = threading.local()
         self.url = BL_API_URL["prod"] if prod else BL_API_URL["test"]
         self.headers = {
             "Content-Type": "application/json;charset=UTF-8"
         }
-   
+        self.timeout = (
+            connect_timeout or BL_CONNECT_TIMEOUT,
+            read_timeout or BL_READ_TIMEOUT,
+        )
+        self.session = get_session(
+            pool_size=pool_size or BL_POOL_SIZE,
+            max_retries=max_retries if max_retries is not None else BL_MAX_RETRIES,
+        )
+        # {operation: (rate, burst)}. The "default" key applies to the
+        # operations without their own limit.
+        self.rate_limits = rate_limits or {}
+        self.rate_limit_wait = rate_limit_wait
+        self.breaker_settings = {
+            "failure_threshold": breaker_threshold or BREAKER_FAILURE_THRESHOLD,
+            "latency_threshold": breaker_latency or BREAKER_LATENCY_THRESHOLD,
+            "reset_timeout": breaker_reset or BREAKER_RESET_TIMEOUT,
+        }
+        # Record every request/response pair in this directory
+        self.capture = capture_dir and get_writer(capture_dir)
+        self.json_dumps = get_json_encoder(json_encoder)
+        # Send gzipped JSON bodies. Disabled if the server refuses them.
+        self.compress = compress
+        self.bulk_max_bytes = bulk_max_bytes or BL_BULK_MAX_BYTES
+
+    @property
+    def last_record(self):
+        """Capture record of the last call of the current thread"""
+        return getattr(self._local, "record", None)
+
+    @last_record.setter
+    def last_record(self, record):
+        self._local.record = record
+
+    @property
+    def bl_last_request(self):
+        """Last request, redacted, as a JSON string"""
+        record = self.last_record
+        if not record:
+            return False
+        request = {k: record[k] for k in ("method", "url", "headers", "params")}
+        request["payload"] = record["json"] or record["data"]
+        return json.dumps(request, default=str)
+
+    @property
+    def bl_last_response(self):
+        """Last response as a JSON string"""
+        record = self.last_record
+        if not record:
+            return False
+        return json.dumps(
+            {"status": record["status"], "body": record["body"]}, default=str
+        )
+
+    def _remember(self, record):
+        """Keep the last redacted request/response and capture them if enabled
+
+        :param dict record: Capture record
+        """
+        self.last_record = record
+        if self.capture:
+            self.capture.write(record)
+
+    def _encode_body(self, kwargs, encoded=None, compress=None):
+        """Serialize the ``json`` argument of a request with our encoder
+
+        :param dict kwargs: Request keyword arguments
+        :param bytes encoded: JSON of kwargs["json"] when already serialized
+        :param bool compress: Gzip the body. Defaults to the object setting.
+        :return dict: Keyword arguments for `requests.Session.request`
+        """
+        if "json" not in kwargs:
+            return kwargs
+        kwargs = dict(kwargs)
+        payload = kwargs.pop("json")
+        data = encoded if encoded is not None else self.json_dumps(payload)
+        headers = dict(kwargs.get("headers") or {})
+        headers["Content-Type"] = "application/json;charset=UTF-8"
+        if compress is None:
+            compress = self.compress
+        if compress and len(data) >= BL_GZIP_MIN_BYTES:
+            data = gzip.compress(data, compresslevel=BL_GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        kwargs.update(data=data, headers=headers)
+        return kwargs
+
+    def _request(self, method, url, kwargs, encoded=None):
+        """Send the request, sending it again uncompressed if refused
+
+        :param str method: HTTP method
+        :param str url: Request url
+        :param dict kwargs: Request keyword arguments
+        :param bytes encoded: JSON of kwargs["json"] when already serialized
+        :return requests.Response: API response
+        """
+        request_kwargs = self._encode_body(kwargs, encoded)
+        response = self.session.request(method, url, **request_kwargs)
+        if response.status_code == 415 and "Content-Encoding" in (
+            request_kwargs.get("headers") or {}
+        ):
+            _logger.warning(
+                "Banlingkit refused a compressed request. Compression disabled."
+            )
+            self.compress = False
+            response = self.session.request(
+                method, url, **self._encode_body(kwargs, encoded, compress=False)
+            )
+        return response
+
+    def _throttle(self, operation):
+        """Wait for the account rate limiter before calling an endpoint
+
+        :param str operation: Operation name
+        :raises BanlingkitRateLimitError: When no token is available in time
+        """
+        rate, burst = self.rate_limits.get(
+            operation, self.rate_limits.get("default", (0, 0))
+        )
+        if not rate:
+            return
+        get_bucket(self.cid, operation, rate, burst).acquire(
+            timeout=self.rate_limit_wait
+        )
 
     @staticmethod
     def _format_error(error):
@@ -57,6 +296,86 @@ class BanlingkitExpressRequest:
             return []
         return [(x.FileName, x.FileContent) for x in documents.Document]
 
+    def _send(self, operation, method, url, encoded=None, **kwargs):
+        """Send a request through the pooled session and record its metrics
+
+        JSON payloads are given in ``json`` and serialized with the object
+        encoder, and compressed when enabled.
+
+        :param str operation: Operation name used in the metrics
+        :param str method: HTTP method
+        :param str url: Request url
+        :param bytes encoded: JSON of kwargs["json"] when already serialized
+        :return tuple: tuple containing:
+            requests.Response: API response
+            dict: Decoded JSON body or None when it isn't JSON
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        breaker = get_breaker(self.cid, operation, **self.breaker_settings)
+        try:
+            breaker.before_call()
+        except BanlingkitCircuitOpenError:
+            metrics.record(self.cid, operation, 0.0, status="circuit_open", error=True)
+            raise
+        try:
+            self._throttle(operation)
+        except Exception:
+            # Our own limiter. It says nothing about the endpoint health.
+            breaker.release()
+            raise
+        # Started once throttled: waiting for a token isn't endpoint latency
+        success = False
+        start = time.perf_counter()
+        try:
+            with metrics.measure(self.cid, operation) as values:
+                response = self._request(method, url, kwargs, encoded)
+                body = code = None
+                if kwargs.get("stream"):
+                    # The caller consumes the content. Don't load it here.
+                    response_bytes = int(response.headers.get("Content-Length") or 0)
+                else:
+                    response_bytes = len(response.content)
+                if not kwargs.get("stream") and "json" in response.headers.get(
+                    "Content-Type", ""
+                ):
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        body = None
+                if isinstance(body, dict):
+                    code = body.get("code", body.get("ErrorCode"))
+                values.update(
+                    request_bytes=len(response.request.body or b""),
+                    response_bytes=response_bytes,
+                    status=response.status_code,
+                    code=code,
+                    error=response.status_code >= 400,
+                )
+            # Functional errors (4xx) don't mean the endpoint is unhealthy
+            success = response.status_code < 500 and response.status_code != 429
+            # Building the record encodes the content, so it's only done
+            # when somebody reads it
+            if self.capture or self.debug or _logger.isEnabledFor(logging.DEBUG):
+                self._remember(
+                    capture_record(
+                        operation,
+                        method,
+                        url,
+                        kwargs,
+                        response,
+                        body,
+                        time.perf_counter() - start,
+                    )
+                )
+            else:
+                self.last_record = None
+        finally:
+            breaker.after_call(success, time.perf_counter() - start)
+        _logger.debug(
+            "Banlingkit %s %s: status %s", operation, url, response.status_code
+        )
+        return response, body
+
     def manifest_shipping(self, shipping_values):
         """Create shipping with the proper picking values
 
@@ -66,72 +385,261 @@ class BanlingkitExpressRequest:
             list: Document binaries
             str: Shipping code
         """
-
-        headers = {
-            "Content-Type": "application/json;charset=UTF-8",
-            "Accept": "application/json",
-        }
-        # Generate the secret key for the API
         url = self.url + "/invoice/create"
-        
         headers = {
             "salt": self.salt,
         }
-
         data = [shipping_values]
-
-        # Send the request to the API
-        print("Request URL: ", url)
-        print("Request Headers: ", headers)
-        print("Request Data: ", data)
-        print("Request Headers: ", headers)
-
-        response = requests.post(url, headers=headers, json=data)
-        print("Response Status Code: ", response.status_code)
-        print("Response Headers: ", response.headers)
-        print("Response Data: ", response.text)
-
-        # logging
-        _logger.info("Request URL: %s", url)
-        _logger.info("Request Headers: %s", headers)
-        _logger.info("Request Data: %s", data)
-        _logger.info("Response Status Code: %s", response.status_code)
-        _logger.info("Response Headers: %s", response.headers)
-        _logger.info("Response Data: %s", response.text)
-
-        cNo = ""
-        printUrl = ""
-
+        response, body = self._send(
+            "manifest_shipping", "POST", url, headers=headers, json=data
+        )
         # check the response status code and response data
         if response.status_code != 200:
             raise Exception("Error in request")
-        
-        if( response.json().get("code") != 1):
+        if (body or {}).get("code") != 1:
             raise Exception("Error in response")
-        if response.json().get("code") == 1:
-            cNo = self.cid + shipping_values.get("sourceCode")
-        
-
+        cNo = self.cid + shipping_values.get("sourceCode")
+        printUrl = ""
         return (
             "1",
             printUrl,
             cNo,
         )
 
+    def _chunks_by_size(self, values, chunk_size, max_bytes):
+        """Split a list of payloads in requests bodies within a byte budget
+
+        Every value is serialized once. The JSON arrays are built joining
+        them, so the bodies aren't serialized again when sent. A value
+        bigger than the budget is sent alone.
+
+        :param list values: Values to split
+        :param int chunk_size: Maximum values per chunk
+        :param int max_bytes: Maximum JSON bytes per chunk
+        :return generator: Tuples of (values, JSON bytes of the values)
+        """
+        chunk_size = max(chunk_size or BL_BULK_CHUNK_SIZE, 1)
+        chunk, encoded, size = [], [], 2
+        for value in values:
+            item = self.json_dumps(value)
+            if chunk and (
+                len(chunk) >= chunk_size or size + len(item) + 1 > max_bytes
+            ):
+                yield chunk, b"[" + b",".join(encoded) + b"]"
+                chunk, encoded, size = [], [], 2
+            chunk.append(value)
+            encoded.append(item)
+            size += len(item) + 1
+        if chunk:
+            yield chunk, b"[" + b",".join(encoded) + b"]"
+
+    @staticmethod
+    def _chunks(values, chunk_size):
+        """Split a list in consecutive chunks of at most chunk_size items
+
+        :param list values: Values to split
+        :param int chunk_size: Maximum chunk length
+        :return generator: Lists of values
+        """
+        chunk_size = max(chunk_size or BL_BULK_CHUNK_SIZE, 1)
+        for index in range(0, len(values), chunk_size):
+            yield values[index : index + chunk_size]
+
+    def _parse_bulk_response(self, chunk, response, body):
+        """Map a /invoice/create response to every shipping of the chunk
+
+        The API answers with a global ``code``. When it gives details per
+        shipping in ``data`` we use them so a single wrong shipping doesn't
+        spoil the rest of the chunk.
+
+        :param list chunk: Shipping values sent in the request
+        :param requests.Response response: API response
+        :param dict body: Decoded response body
+        :return dict: sourceCode -> (errors, documents, tracking)
+        """
+        results = {}
+        if response.status_code != 200:
+            error = [(str(response.status_code), "Error in request")]
+            for values in chunk:
+                results[values["sourceCode"]] = (error, "", "")
+            return results
+        body = body if isinstance(body, dict) else {}
+        items = body.get("data")
+        details = {}
+        if isinstance(items, list):
+            details = {
+                item.get("sourceCode"): item
+                for item in items
+                if isinstance(item, dict) and item.get("sourceCode")
+            }
+        for values in chunk:
+            source_code = values["sourceCode"]
+            item = details.get(source_code, body)
+            if item.get("code", body.get("code")) == 1:
+                results[source_code] = ([], "", self.cid + source_code)
+            else:
+                message = item.get("msg") or item.get("message") or "Error in response"
+                results[source_code] = ([(str(item.get("code")), message)], "", "")
+        return results
+
+    def manifest_shipping_bulk(self, shipping_values_list, chunk_size=None):
+        """Create many shippings packing them in chunked /invoice/create calls
+
+        Chunks hold at most chunk_size shippings and `bulk_max_bytes` of
+        JSON.
+
+        :param list shipping_values_list: Shipping values prepared from Odoo
+        :param int chunk_size: Shippings per request
+        :return dict: sourceCode -> tuple containing:
+            list: Error codes in the form of tuples (code, description)
+            str: Document url
+            str: Shipping code
+        """
+        import requests
+
+        url = self.url + "/invoice/create"
+        headers = {
+            "salt": self.salt,
+        }
+        results = {}
+        chunks = self._chunks_by_size(
+            shipping_values_list, chunk_size, self.bulk_max_bytes
+        )
+        for chunk, encoded in chunks:
+            try:
+                response, body = self._send(
+                    "manifest_shipping_bulk",
+                    "POST",
+                    url,
+                    encoded=encoded,
+                    headers=headers,
+                    json=chunk,
+                )
+            except (
+                requests.RequestException,
+                BanlingkitRateLimitError,
+                BanlingkitCircuitOpenError,
+            ) as e:
+                _logger.warning("Banlingkit bulk request failed: %s", e)
+                for values in chunk:
+                    results[values["sourceCode"]] = ([("", str(e))], "", "")
+                continue
+            _logger.info(
+                "Banlingkit bulk request: %s shippings, status %s",
+                len(chunk),
+                response.status_code,
+            )
+            results.update(self._parse_bulk_response(chunk, response, body))
+        return results
+
+    def download_document(self, url, target):
+        """Stream a shipping document (label) into a file through the pooled
+        session, so memory doesn't depend on the document size
+
+        :param str url: Document url
+        :param file target: Binary file object where the document is written
+        :return int: Document size
+        """
+        response, _body = self._send("get_document", "GET", url, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise Exception("Error in request")
+            size = 0
+            for chunk in response.iter_content(BL_DOWNLOAD_CHUNK_SIZE):
+                target.write(chunk)
+                size += len(chunk)
+        target.seek(0)
+        return size
+
+    @staticmethod
+    def _format_tracking_event(event):
+        """Normalize a tracking event of the API
+
+        :param dict event: Tracking event as returned by the API
+        :return dict: Tracking with the keys used by the carrier methods
+        """
+        event_time = event.get("time") or event.get("trackTime")
+        try:
+            status_datetime = datetime.strptime(event_time, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            status_datetime = False
+        return {
+            "StatusDateTime": status_datetime,
+            "StatusCode": str(event.get("status") or event.get("statusCode") or ""),
+            "StatusDescription": event.get("statusDesc") or event.get("content") or "",
+            "IncidentCode": event.get("incidentCode") or "",
+            "IncidentDescription": event.get("incidentDesc") or "",
+        }
+
+    @staticmethod
+    def parse_tracking_push(payload):
+        """Group the events of a tracking push by shipping code
+
+        Pushes can hold a single event, a shipping with its ``tracks`` like
+        the tracking query answer, or a list of both, optionally wrapped in
+        ``data``.
+
+        :param payload: Decoded JSON body of the push
+        :return dict: shipping code -> list of raw events
+        """
+        if isinstance(payload, dict) and "data" in payload:
+            payload = payload["data"]
+        if not isinstance(payload, list):
+            payload = [payload]
+        events = {}
+        for item in payload:
+            if not isinstance(item, dict):
+                continue
+            num = item.get("num") or item.get("trackingNo")
+            if not num:
+                continue
+            tracks = item.get("tracks")
+            if tracks is None:
+                tracks = [item]
+            events.setdefault(str(num), []).extend(
+                t for t in tracks if isinstance(t, dict)
+            )
+        return events
+
+    def get_tracking_multi(self, shipping_codes):
+        """Gather tracking status of many shipping codes in a single call
+
+        :param list shipping_codes: Shipping codes. At most
+            BL_TRACKING_CHUNK_SIZE of them.
+        :return tuple: contents of tuple:
+            list: error codes in the form of tuples (code, descriptions)
+            dict: shipping code -> list of tracking dicts, oldest first
+        """
+        url = self.url + BL_TRACKING_PATH
+        headers = {
+            "salt": self.salt,
+        }
+        data = {"nums": ",".join(shipping_codes)}
+        response, body = self._send(
+            "get_tracking", "GET", url, headers=headers, params=data
+        )
+        if response.status_code != 200:
+            return [(str(response.status_code), "Error in request")], {}
+        body = body if isinstance(body, dict) else {}
+        if body.get("code") != 1:
+            return [(str(body.get("code")), body.get("msg") or "Error in response")], {}
+        trackings = {}
+        for item in body.get("data") or []:
+            events = [self._format_tracking_event(e) for e in item.get("tracks") or []]
+            events.sort(key=lambda e: e["StatusDateTime"] or datetime.min)
+            trackings[item.get("num")] = events
+        return [], trackings
+
     def get_tracking(self, shipping_code):
-        """Gather tracking status of shipping code. Maps to API's GetTracking.
+        """Gather tracking status of shipping code
 
         :param str shipping_code: Shipping code
         :return tuple: contents of tuple:
             list: error codes in the form of tuples (code, descriptions)
-            list: of OrderedDict with statuses
+            list: of dicts with statuses, oldest first
         """
-        values = dict(self._credentials(), ShippingCode=shipping_code)
-        response = self.client.service.GetTracking(**values)
-        return (
-            self._format_error(response.ErrorCodes),
-            (response.Tracking and serialize_object(response.Tracking.Tracking) or []),
-        )
+        error, trackings = self.get_tracking_multi([shipping_code])
+        return error, trackings.get(shipping_code, [])
 
     def get_documents(self, shipping_code):
         """Get shipping documents (label)
@@ -167,31 +675,103 @@ class BanlingkitExpressRequest:
             - MULTI4: Landscape 4 labels per sheet
         :param str kind_code: (PDF|PNG|BMP), defaults to PDF
         :param int offset: Document offset, defaults to 0
-        :return tuple: tuple containing:
-            list: error codes in the form of tuples (code, descriptions)
-            list: documents in the form of tuples (file_content, file_name)
+        :return dict: Decoded API response
         """
-        url = "https://label.Banlingkit.com/BanlingkitPrint"
-        timestamp = str(int(time.time()*1000))
-        
         data = {
             "icID": self.cid,
             "signature": self.salt,
             "cNos": shipping_codes,
             "ptemp": "label10x15_1",
+            "modelCode": model_code,
+            "kindCode": kind_code,
+            "offset": offset,
         }
-        response = requests.get(url, params=data)
-        print("Response full url: ", response.request.url)
-        print("Request URL: ", url)
-        print("Request Headers: ", self.headers)
-        print("Request Data: ", data)
-        print("Response Status Code: ", response.status_code)
-        print("Response: ", response.text)
+        response, body = self._send(
+            "get_documents_multi", "GET", BL_LABEL_URL, params=data
+        )
         if response.status_code != 200:
             raise Exception("Error in request")
-        if response.json().get("ErrorCode") != 0:
+        if (body or {}).get("ErrorCode") != 0:
             raise Exception("Error in response")
-        return response.json()
+        return body
+
+    def _extract_document(self, body):
+        """Get the document content from a label service response
+
+        :param dict body: Decoded label service response
+        :return bytes: Document content
+        """
+        for key in ("Url", "url", "printUrl"):
+            if body.get(key):
+                response, _body = self._send("get_document", "GET", body[key])
+                if response.status_code != 200:
+                    raise Exception("Error in request")
+                return response.content
+        for key in ("FileContent", "Data", "data"):
+            if isinstance(body.get(key), str):
+                return base64.b64decode(body[key])
+        raise Exception("Error in response")
+
+    @staticmethod
+    def _label_chunks(shipping_codes, chunk_size, max_length):
+        """Split the shipping codes so every label query stays short enough
+
+        :param list shipping_codes: Shipping codes
+        :param int chunk_size: Maximum codes per query
+        :param int max_length: Maximum length of the joined codes
+        :return generator: Lists of codes
+        """
+        chunk, length = [], 0
+        for code in shipping_codes:
+            if chunk and (
+                len(chunk) >= chunk_size or length + len(code) + 1 > max_length
+            ):
+                yield chunk
+                chunk, length = [], 0
+            chunk.append(code)
+            length += len(code) + 1
+        if chunk:
+            yield chunk
+
+    def get_documents_chunked(
+        self,
+        shipping_codes,
+        model_code="SINGLE",
+        kind_code="PDF",
+        offset=0,
+        chunk_size=BL_LABEL_CHUNK_SIZE,
+        workers=1,
+    ):
+        """Get the documents of many shipping codes in concurrent chunks
+
+        :param list shipping_codes: Shipping codes
+        :param str model_code: (SINGLE|MULTI1|MULTI3|MULTI4), defaults to SINGLE
+        :param str kind_code: (PDF|PNG|BMP), defaults to PDF
+        :param int offset: Document offset, defaults to 0
+        :param int chunk_size: Maximum codes per query
+        :param int workers: Chunks fetched at the same time
+        :return list: Documents content, one per chunk in the codes order
+        """
+        chunks = list(
+            self._label_chunks(shipping_codes, chunk_size, BL_LABEL_MAX_QUERY_LENGTH)
+        )
+
+        def fetch(chunk):
+            body = self.get_documents_multi(
+                ";".join(chunk),
+                model_code=model_code,
+                kind_code=kind_code,
+                offset=offset,
+            )
+            return self._extract_document(body), self.last_record
+
+        if len(chunks) < 2 or workers < 2:
+            return [fetch(chunk)[0] for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            responses = list(executor.map(fetch, chunks))
+        # The caller logs the last call of its own thread
+        self.last_record = responses[-1][1]
+        return [document for document, _record in responses]
 
     def get_service_types(self):
         """Gets the hired service types. Maps to API's GetServiceTypes.
@@ -266,10 +846,7 @@ class BanlingkitExpressRequest:
         data = {
         }
 
-        # Send the request to the API
-        print("Request URL: ", url)
-        
-        response = requests.put(url, headers=headers, data=data)
-        print("Response Status Code: ", response.status_code)
-        print(response.text)
+        response, _body = self._send(
+            "create_request", "PUT", url, headers=headers, data=data
+        )
         return (response.status_code, response.text)
@@ -0,0 +1,193 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import logging
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Seconds to wait before the first retry. It doubles on every attempt.
+JOB_BACKOFF_BASE = 60
+JOB_BACKOFF_MAX = 3600
+
+
+class BanlingkitShipmentJob(models.Model):
+    _name = "banlingkit.shipment.job"
+    _inherit = "banlingkit.queue.mixin"
+    _description = "Banlingkit Express pending shipment"
+    _order = "id"
+
+    picking_id = fields.Many2one(
+        comodel_name="stock.picking", required=True, ondelete="cascade", index=True
+    )
+    carrier_id = fields.Many2one(
+        comodel_name="delivery.carrier", required=True, ondelete="cascade"
+    )
+    state = fields.Selection(
+        selection=[
+            ("pending", "Pending"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempts = fields.Integer(readonly=True)
+    next_attempt = fields.Datetime(default=fields.Datetime.now, index=True)
+    tracking_ref = fields.Char(readonly=True)
+    error = fields.Text(readonly=True)
+
+    @api.model
+    def _enqueue(self, pickings):
+        """Queue the pickings shippings. Validation only pays this insert.
+
+        :param recordset pickings: `stock.picking` recordset
+        :return recordset: Created jobs
+        """
+        return self.create(
+            [
+                {"picking_id": picking.id, "carrier_id": picking.carrier_id.id}
+                for picking in pickings
+            ]
+        )
+
+    def _acquire(self, limit, carrier):
+        """Lock the due jobs of a carrier
+
+        :param int limit: Maximum jobs taken
+        :param record carrier: `delivery.carrier` record whose jobs are taken
+        :return recordset: Locked jobs
+        """
+        return self._acquire_rows(
+            limit,
+            "state = 'pending' AND next_attempt <= %s AND carrier_id = %s",
+            (fields.Datetime.now(), carrier.id),
+            order="next_attempt, id",
+        )
+
+    def _retry_later(self, error):
+        """Plan the next attempt with exponential backoff or give up
+
+        :param str error: Error description
+        """
+        now = fields.Datetime.now()
+        for job in self:
+            attempts = job.attempts + 1
+            max_attempts = job.carrier_id.banlingkit_async_max_attempts
+            delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+            job.write(
+                {
+                    "attempts": attempts,
+                    "error": error,
+                    "state": "failed" if attempts >= max_attempts else "pending",
+                    "next_attempt": now + timedelta(seconds=delay),
+                }
+            )
+            if job.state == "failed":
+                job.picking_id.message_post(
+                    body=_("Banlingkit Express shipping failed: %s") % error
+                )
+
+    def _process(self):
+        """Send the shippings of the jobs of a single carrier
+
+        Banlingkit is called first, without touching the database. Then every
+        created shipping has its tracking number stored and its job closed in
+        its own savepoint, so nothing done afterwards can roll them back and
+        send them again. The label, the chatter and the delivery cost come
+        last, each picking in its own savepoint too: a failure there is only
+        logged in the job.
+        """
+        carrier = self.carrier_id
+        jobs = self.filtered(lambda j: not j.picking_id.carrier_tracking_ref)
+        (self - jobs).write({"state": "done"})
+        if not jobs:
+            return
+        pickings = jobs.mapped("picking_id")
+        bl_request = carrier._bl_request()
+        try:
+            with self.env.cr.savepoint():
+                payloads = carrier._banlingkit_prepare_batch(pickings)
+        except Exception as e:
+            _logger.warning("Banlingkit shipment jobs %s failed: %s", jobs.ids, e)
+            jobs._retry_later(str(e))
+            return
+        responses = carrier._banlingkit_create_shippings(payloads, bl_request)
+        for job, vals, response in zip(jobs, payloads, responses):
+            error, _documents, tracking, _label = response
+            if error or not tracking:
+                job._retry_later(
+                    "\n".join("[{}] {}".format(*e) for e in error)
+                    or _("No tracking number received")
+                )
+                continue
+            job._shipping_created(vals, response, bl_request)
+
+    def _shipping_created(self, vals, response, bl_request):
+        """Store a shipping created at Banlingkit and finish it
+
+        :param dict vals: Shipping values sent to the API
+        :param tuple response: Result of `_banlingkit_create_shippings`
+        :param BanlingkitExpressRequest bl_request: Request object
+        """
+        self.ensure_one()
+        picking, carrier = self.picking_id, self.carrier_id
+        tracking = response[2]
+        try:
+            with self.env.cr.savepoint():
+                picking.carrier_tracking_ref = tracking
+                self.write({"state": "done", "tracking_ref": tracking, "error": False})
+        except Exception as e:
+            # Never sent again: it exists at Banlingkit already
+            _logger.exception("Banlingkit shipping %s not stored", tracking)
+            self.write(
+                {
+                    "state": "failed",
+                    "tracking_ref": tracking,
+                    "error": _("Created at Banlingkit but not stored: %s") % e,
+                }
+            )
+            return
+        try:
+            with self.env.cr.savepoint():
+                vals = carrier._banlingkit_finish_shipping(
+                    picking, vals, response, bl_request
+                )
+                picking._banlingkit_shipping_sent(vals)
+        except Exception as e:
+            _logger.exception("Banlingkit shipping %s not finished", tracking)
+            self.error = _("Label or delivery cost failed: %s") % e
+
+    @api.model
+    def _cron_process_jobs(self, limit=1000):
+        """Drain the due jobs respecting every carrier throughput
+
+        Jobs are locked one carrier at a time and committed once sent, so a
+        commit never releases jobs this run still has to send.
+
+        :param int limit: Maximum jobs taken in this run
+        """
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT carrier_id FROM banlingkit_shipment_job
+            WHERE state = 'pending' AND next_attempt <= %s
+            """,
+            (fields.Datetime.now(),),
+        )
+        carriers = self.env["delivery.carrier"].browse(
+            [row[0] for row in self.env.cr.fetchall()]
+        )
+        for carrier in carriers:
+            if limit <= 0:
+                return
+            # Jobs over the carrier throughput are left for the next run
+            jobs = self._acquire(
+                min(carrier.banlingkit_async_batch_size or limit, limit), carrier
+            )
+            if not jobs:
+                continue
+            jobs._process()
+            limit -= len(jobs)
+            self.env.cr.commit()  # pylint: disable=invalid-commit
@@ -0,0 +1,31 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import hashlib
+
+from odoo import api, fields, models
+
+
+class BanlingkitTrackingEvent(models.Model):
+    _name = "banlingkit.tracking.event"
+    _description = "Banlingkit Express tracking event"
+    _order = "picking_id, event_datetime, id"
+
+    picking_id = fields.Many2one(
+        comodel_name="stock.picking", required=True, ondelete="cascade", index=True
+    )
+    event_datetime = fields.Datetime()
+    status_code = fields.Char()
+    incident_code = fields.Char()
+
+    @api.model
+    def _fingerprint(self, tracking):
+        """Short digest identifying a tracking event
+
+        :param dict tracking: Banlingkit tracking values
+        :return str: Fingerprint
+        """
+        key = "{}|{}|{}".format(
+            fields.Datetime.to_string(tracking["StatusDateTime"]) or "",
+            tracking["StatusCode"],
+            tracking["IncidentCode"],
+        )
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
@@ -0,0 +1,120 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import json
+import logging
+from datetime import datetime
+
+from odoo import api, fields, models
+
+from .banlingkit_request import BanlingkitExpressRequest
+
+_logger = logging.getLogger(__name__)
+
+# Pushes applied together: a single pickings lookup and events insert each
+PUSH_BATCH_SIZE = 1000
+
+
+class BanlingkitTrackingPush(models.Model):
+    _name = "banlingkit.tracking.push"
+    _inherit = "banlingkit.queue.mixin"
+    _description = "Banlingkit Express pending tracking push"
+    _order = "id"
+
+    carrier_id = fields.Many2one(
+        comodel_name="delivery.carrier", required=True, ondelete="cascade"
+    )
+    tracking_ref = fields.Char(required=True)
+    events = fields.Text(required=True, help="Pushed events as JSON")
+
+    @api.model
+    def _enqueue(self, carrier, events_by_reference):
+        """Queue the events of a push. The webhook only pays this insert.
+
+        :param record carrier: `delivery.carrier` authenticated record
+        :param dict events_by_reference: shipping code -> raw events
+        :return recordset: Created pushes
+        """
+        return self.create(
+            [
+                {
+                    "carrier_id": carrier.id,
+                    "tracking_ref": reference,
+                    "events": json.dumps(events),
+                }
+                for reference, events in events_by_reference.items()
+            ]
+        )
+
+    def _apply(self):
+        """Store the pushed events in their pickings
+
+        Pickings are looked up once for the whole batch. Pushes of the same
+        shipping are merged, new events are inserted at once and the push
+        date is written in a single update.
+
+        :return int: Pickings updated
+        """
+        carriers = self.env["delivery.carrier"].search(
+            [("delivery_type", "=", "banlingkit")]
+        )
+        # Carriers of the same account share their shippings
+        accounts = {carrier: carrier._bl_request().cid for carrier in carriers}
+        references = list(set(self.mapped("tracking_ref")))
+        pickings = self.env["stock.picking"].search(
+            [
+                ("carrier_id", "in", carriers.ids),
+                ("carrier_tracking_ref", "in", references),
+            ]
+        )
+        by_reference = {
+            (accounts[picking.carrier_id], picking.carrier_tracking_ref): picking
+            for picking in pickings
+        }
+        raw_events = {}
+        for push in self:
+            key = (accounts.get(push.carrier_id), push.tracking_ref)
+            picking = by_reference.get(key)
+            if not picking:
+                _logger.debug("Banlingkit push of unknown shipping %s", key[1])
+                continue
+            raw_events.setdefault(picking, []).extend(json.loads(push.events))
+        Event = self.env["banlingkit.tracking.event"]
+        new_events = []
+        updated = self.env["stock.picking"]
+        for picking, events in raw_events.items():
+            trackings = {}
+            for event in events:
+                tracking = BanlingkitExpressRequest._format_tracking_event(event)
+                trackings.setdefault(Event._fingerprint(tracking), tracking)
+            trackings = sorted(
+                trackings.values(), key=lambda t: t["StatusDateTime"] or datetime.min
+            )
+            changes = picking.carrier_id._banlingkit_tracking_changes(
+                picking, trackings
+            )
+            updated |= picking
+            if not changes:
+                continue
+            new_events += changes[0]
+            picking.write(changes[1])
+        Event.create(new_events)
+        updated.write({"banlingkit_tracking_push_date": fields.Datetime.now()})
+        return len(updated)
+
+    @api.model
+    def _cron_apply_pushes(self, batch_size=PUSH_BATCH_SIZE):
+        """Apply the queued tracking pushes in batches
+
+        :param int batch_size: Pushes applied together
+        """
+        while True:
+            pushes = self._acquire_rows(batch_size)
+            if not pushes:
+                return
+            updated = pushes._apply()
+            pushes.unlink()
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            _logger.info(
+                "Banlingkit tracking pushes: %s applied to %s pickings",
+                len(pushes),
+                updated,
+            )
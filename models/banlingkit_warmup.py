@@ -0,0 +1,86 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import logging
+import os
+import subprocess
+import sys
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Helper modules imported when the addon is loaded. The heavy libraries
+# (reportlab, Pillow, requests, xlsxwriter) are imported by the code paths
+# that need them, so these must stay cheap.
+BOOT_MODULES = (
+    "banlingkit_capture",
+    "banlingkit_circuit_breaker",
+    "banlingkit_label",
+    "banlingkit_label_text",
+    "banlingkit_master_data",
+    "banlingkit_metrics",
+    "banlingkit_rate_limit",
+    "banlingkit_request",
+)
+# Seconds allowed to import them in a fresh interpreter
+IMPORT_TIME_BUDGET = 0.1
+# Libraries the boot modules must not import
+HEAVY_MODULES = ("reportlab", "PIL", "requests", "urllib3", "xlsxwriter", "lxml")
+
+_IMPORT_TIME_SCRIPT = """
+import json, sys, time, types
+package = types.ModuleType("banlingkit_boot")
+package.__path__ = [sys.argv[1]]
+sys.modules["banlingkit_boot"] = package
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__("banlingkit_boot." + name)
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(%r))
+print(json.dumps({"elapsed": elapsed, "heavy": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import_time(modules=BOOT_MODULES):
+    """Import the helper modules in a fresh interpreter and time it
+
+    A new process is used because the current one has them (and most of
+    their dependencies) cached already.
+
+    :param tuple modules: Module names in the models package
+    :return dict: {"elapsed": seconds, "heavy": heavy libraries imported}
+    """
+    import json
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _IMPORT_TIME_SCRIPT,
+            os.path.dirname(os.path.abspath(__file__)),
+        ]
+        + list(modules),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def warm_up():
+    """Load what the first label of a worker would load
+
+    The barcode and canvas modules are imported and the label font is
+    parsed, so the first label doesn't pay for them.
+
+    :return float: Elapsed seconds
+    """
+    from .banlingkit_label import FONT_PATH, get_barcode, register_font
+
+    start = time.perf_counter()
+    from reportlab.pdfgen import canvas  # noqa: F401
+
+    get_barcode("WARMUP")
+    if os.path.exists(FONT_PATH):
+        register_font()
+    else:
+        _logger.warning("Banlingkit label font not found: %s", FONT_PATH)
+    return time.perf_counter() - start
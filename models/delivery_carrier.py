@@ -1,16 +1,69 @@
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
 import logging
 from odoo.tools.config import config
+from odoo.tools.pdf import merge_pdf
 from odoo import http
-import requests
-import base64
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
 
 _logger = logging.getLogger(__name__)
 
-# from .banlingkit_master_data import (
-# )
-from .banlingkit_request import BanlingkitExpressRequest
+from .banlingkit_master_data import (
+    BANLINGKIT_DELIVERY_STATES_STATIC,
+    BANLINGKIT_FINAL_STATES,
+)
+from .banlingkit_capture import ReplaySession, load_capture, replay
+from .banlingkit_circuit_breaker import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_LATENCY_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    breakers_snapshot,
+)
+from .banlingkit_label import LABEL_DPI, LABEL_MIMETYPES, render_label
+from .banlingkit_metrics import metrics
+from .banlingkit_warmup import warm_up
+from .banlingkit_request import (
+    BL_BULK_CHUNK_SIZE,
+    BL_BULK_MAX_BYTES,
+    BL_CONNECT_TIMEOUT,
+    BL_MAX_RETRIES,
+    BL_POOL_SIZE,
+    BL_READ_TIMEOUT,
+    BL_TRACKING_CHUNK_SIZE,
+    BanlingkitExpressRequest,
+)
+
+# Bytes read at once when storing labels
+LABEL_CHUNK_SIZE = 64 * 1024
+
+# Carrier fields used to build the request objects
+BL_CONNECTION_FIELDS = [
+    "banlingkit_api_cid",
+    "banlingkit_api_token",
+    "banlingkit_connect_timeout",
+    "banlingkit_read_timeout",
+    "banlingkit_pool_size",
+    "banlingkit_max_retries",
+    "banlingkit_rate_limit",
+    "banlingkit_rate_burst",
+    "banlingkit_rate_wait",
+    "banlingkit_rate_limit_endpoints",
+    "banlingkit_breaker_threshold",
+    "banlingkit_breaker_latency",
+    "banlingkit_breaker_reset",
+    "banlingkit_capture",
+    "banlingkit_gzip_requests",
+    "banlingkit_bulk_max_bytes",
+    "debug_logging",
+]
 
 
 class DeliveryCarrier(models.Model):
@@ -45,6 +98,168 @@ class DeliveryCarrier(models.Model):
         string="Document format",
     )
     banlingkit_document_offset = fields.Integer(string="Document Offset")
+    banlingkit_label_format = fields.Selection(
+        selection=[
+            ("pdf", "Document format"),
+            ("zpl", "ZPL (Zebra)"),
+            ("epl", "EPL (Eltron)"),
+        ],
+        default="pdf",
+        string="Local label format",
+        help="Format of the labels rendered by Odoo when Banlingkit doesn't "
+        "provide one. By default the document format and model are used. "
+        "ZPL and EPL labels are printed natively by thermal printers.",
+    )
+    banlingkit_label_dpi = fields.Integer(
+        string="Label resolution",
+        default=LABEL_DPI,
+        help="Dots per inch of the PNG, BMP, ZPL and EPL labels rendered by "
+        "Odoo.",
+    )
+    banlingkit_connect_timeout = fields.Float(
+        string="Connect timeout",
+        default=BL_CONNECT_TIMEOUT,
+        help="Seconds to wait for the connection to the Banlingkit API.",
+    )
+    banlingkit_read_timeout = fields.Float(
+        string="Read timeout",
+        default=BL_READ_TIMEOUT,
+        help="Seconds to wait for the Banlingkit API to answer.",
+    )
+    banlingkit_pool_size = fields.Integer(
+        string="Connection pool size",
+        default=BL_POOL_SIZE,
+        help="Connections kept alive per worker to the Banlingkit hosts.",
+    )
+    banlingkit_max_retries = fields.Integer(
+        string="Max retries",
+        default=BL_MAX_RETRIES,
+        help="Retries with backoff for idempotent calls (never for shipment "
+        "creation).",
+    )
+    banlingkit_rate_limit = fields.Float(
+        string="Rate limit",
+        help="Requests per second allowed for this account, shared by every "
+        "worker of the server. 0 disables the limit.",
+    )
+    banlingkit_rate_burst = fields.Integer(
+        string="Rate burst",
+        default=10,
+        help="Requests that can be sent at once before the rate limit applies.",
+    )
+    banlingkit_rate_wait = fields.Float(
+        string="Rate limit wait",
+        default=10.0,
+        help="Maximum seconds a call waits for the rate limiter. 0 makes it "
+        "fail at once.",
+    )
+    banlingkit_rate_limit_endpoints = fields.Text(
+        string="Rate limit per operation",
+        help="One operation per line with its rate and burst, e.g.:\n"
+        "manifest_shipping = 5/10\nget_tracking = 20/40",
+    )
+    banlingkit_breaker_threshold = fields.Integer(
+        string="Failures to open circuit",
+        default=BREAKER_FAILURE_THRESHOLD,
+        help="Consecutive failed or slow calls to an operation after which "
+        "the calls fail at once for a while.",
+    )
+    banlingkit_breaker_latency = fields.Float(
+        string="Slow call threshold",
+        default=BREAKER_LATENCY_THRESHOLD,
+        help="Seconds after which a call counts as failed for the circuit "
+        "breaker.",
+    )
+    banlingkit_breaker_reset = fields.Float(
+        string="Circuit open time",
+        default=BREAKER_RESET_TIMEOUT,
+        help="Seconds the circuit stays open before probing the operation "
+        "again. It doubles on every failed probe.",
+    )
+    banlingkit_circuit_state = fields.Text(
+        string="Circuit state",
+        compute="_compute_banlingkit_circuit_state",
+        help="State of the circuit breakers of this account in the worker "
+        "answering the request.",
+    )
+    banlingkit_capture = fields.Boolean(
+        string="Capture traffic",
+        help="Record every request and response (without credentials nor "
+        "consignee personal data) in the server captures directory to replay "
+        "them later.",
+    )
+    banlingkit_bulk_send = fields.Boolean(
+        string="Bulk shipping creation",
+        help="Send the queued shippings of every scheduled action run in "
+        "chunked requests instead of one request per picking. Only used with "
+        "asynchronous shipping.",
+    )
+    banlingkit_bulk_chunk_size = fields.Integer(
+        string="Bulk chunk size",
+        default=BL_BULK_CHUNK_SIZE,
+        help="Maximum shippings sent in every bulk request.",
+    )
+    banlingkit_bulk_max_bytes = fields.Integer(
+        string="Bulk request size",
+        default=BL_BULK_MAX_BYTES,
+        help="Maximum bytes of JSON (before compression) sent in every bulk "
+        "request. Chunks are made smaller to stay below it.",
+    )
+    banlingkit_gzip_requests = fields.Boolean(
+        string="Compress requests",
+        help="Send the JSON bodies gzipped. It's disabled for the worker if "
+        "Banlingkit refuses them.",
+    )
+    banlingkit_concurrency = fields.Integer(
+        string="Concurrent shippings",
+        default=1,
+        help="Queued shippings sent at the same time in every scheduled "
+        "action run. Only used with asynchronous shipping. Keep it below the "
+        "connection pool size.",
+    )
+    banlingkit_async_send = fields.Boolean(
+        string="Asynchronous shipping",
+        help="Validation only queues the shipping. A scheduled action sends "
+        "it to Banlingkit afterwards.",
+    )
+    banlingkit_async_batch_size = fields.Integer(
+        string="Shippings per run",
+        default=100,
+        help="Maximum queued shippings sent for this carrier in every "
+        "scheduled action run.",
+    )
+    banlingkit_async_max_attempts = fields.Integer(
+        string="Max attempts",
+        default=5,
+        help="Queued shippings are retried with an increasing delay until "
+        "this number of attempts.",
+    )
+
+    banlingkit_tracking_push = fields.Boolean(
+        string="Tracking pushes",
+        help="Banlingkit pushes the tracking events to "
+        "/delivery/banlingkit/tracking, authenticated with the account salt. "
+        "Only the shippings without pushes for a while are polled.",
+    )
+    banlingkit_tracking_silence = fields.Float(
+        string="Poll silent shippings after",
+        default=24.0,
+        help="Hours without tracking pushes after which a shipping is "
+        "polled by the tracking refresh scheduled action.",
+    )
+
+    def _compute_banlingkit_circuit_state(self):
+        snapshot = breakers_snapshot()
+        for carrier in self:
+            breakers = snapshot.get(carrier.banlingkit_api_cid or "", {})
+            carrier.banlingkit_circuit_state = "\n".join(
+                "{}: {}{}".format(
+                    operation,
+                    state["state"],
+                    state["retry_in"] and " ({:.0f}s)".format(state["retry_in"]) or "",
+                )
+                for operation, state in sorted(breakers.items())
+            )
 
     @api.onchange("delivery_type")
     def _onchange_delivery_type_ctt(self):
@@ -52,36 +267,216 @@ class DeliveryCarrier(models.Model):
         if self.delivery_type == "banlingkit":
             self.price_method = "base_on_rule"
 
-    def _bl_request(self):
-        """Get Banlingkit Request object
+    @api.model
+    def _bl_request_fields(self):
+        """Fields that define a request object. Changing them clears the cache
+
+        :return list: Field names
+        """
+        return [
+            name
+            for name in self._fields
+            if name.startswith("banlingkit_")
+            or name in ("prod_environment", "debug_logging")
+        ]
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) & set(self._bl_request_fields()):
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
 
+    def _bl_build_request(self, values):
+        """Build a request object from the carrier connection values
+
+        Credentials fall back to the server configuration when they aren't
+        set in the carrier. The fallback isn't written in the record.
+
+        :param dict values: Carrier connection values
         :return BanlingkitExpressRequest: Banlingkit Express Request object
         """
-        _logger.debug("banlingkit_api_cid: %s", self.banlingkit_api_cid)
-        if not self.banlingkit_api_cid:
-            _logger.warning("banlingkit_api_cid is False, please check configuration.")
-        record_values = self.read()[0]
-        _logger.debug("banlingkit_api_token: %s", record_values["banlingkit_api_token"])
-        if self.banlingkit_api_token is False:
-            # read the value from the configuration
-            _logger.warning("banlingkit_api_token is False, please check configuration.")
-            self.banlingkit_api_token = config.get(
-                "banlingkit_api_salt", self.banlingkit_api_token
+        api_cid = values["banlingkit_api_cid"] or config.get("banlingkit_api_cid")
+        api_salt = values["banlingkit_api_token"] or config.get("banlingkit_api_salt")
+        if not api_cid or not api_salt:
+            _logger.warning(
+                "Banlingkit credentials missing for carrier %s, please check "
+                "configuration.",
+                self.id,
             )
-        if self.banlingkit_api_cid is False:
-            self.banlingkit_api_cid = config.get(
-                "banlingkit_api_cid", self.banlingkit_api_cid
-            )
-        print("banlingkit_api_cid")
-        print(self.banlingkit_api_cid)
-        print("banlingkit_api_token")
-        print(self.banlingkit_api_token)
-
         return BanlingkitExpressRequest(
-            api_cid=self.banlingkit_api_cid,
-            api_salt=self.banlingkit_api_token,
+            api_cid=api_cid,
+            api_salt=api_salt,
             prod=self.prod_environment,
+            connect_timeout=values["banlingkit_connect_timeout"],
+            read_timeout=values["banlingkit_read_timeout"],
+            pool_size=values["banlingkit_pool_size"],
+            max_retries=values["banlingkit_max_retries"],
+            rate_limits=self._bl_parse_rate_limits(values),
+            rate_limit_wait=values["banlingkit_rate_wait"],
+            breaker_threshold=values["banlingkit_breaker_threshold"],
+            breaker_latency=values["banlingkit_breaker_latency"],
+            breaker_reset=values["banlingkit_breaker_reset"],
+            capture_dir=values["banlingkit_capture"] and self._bl_capture_dir(),
+            json_encoder=config.get("banlingkit_json_encoder"),
+            compress=values["banlingkit_gzip_requests"],
+            bulk_max_bytes=values["banlingkit_bulk_max_bytes"],
+            debug=values["debug_logging"],
+        )
+
+    def _register_hook(self):
+        res = super()._register_hook()
+        if tools.str2bool(config.get("banlingkit_warmup") or "0"):
+            self._banlingkit_warm_up()
+        return res
+
+    @api.model
+    def _banlingkit_warm_up(self):
+        """Prepare the worker for its first label and API call
+
+        It's run when the registry is loaded if the ``banlingkit_warmup``
+        server option is set. The label font and libraries are loaded and
+        the request objects (with their pooled sessions) are built and cached
+        for every Banlingkit carrier.
+
+        :return float: Elapsed seconds
+        """
+        start = time.perf_counter()
+        try:
+            warm_up()
+        except Exception:
+            _logger.exception("Banlingkit labels warm-up failed")
+        carriers = self.sudo().search([("delivery_type", "=", "banlingkit")])
+        for carrier in carriers:
+            carrier._bl_request()
+        elapsed = time.perf_counter() - start
+        _logger.info(
+            "Banlingkit warm-up of %s carriers done in %.3fs", len(carriers), elapsed
         )
+        return elapsed
+
+    @api.model
+    def _bl_capture_dir(self):
+        """Directory where the Banlingkit traffic captures are written
+
+        :return str: Directory path
+        """
+        return config.get("banlingkit_capture_dir") or os.path.join(
+            config["data_dir"], "banlingkit_capture"
+        )
+
+    def _banlingkit_replay_capture(self, path, speed=0.0, offline=True):
+        """Send the shippings of a capture file again through the carrier
+
+        Useful to load test and profile with production payloads. They go
+        through the same bulk or parallel path as the validated pickings,
+        with this carrier settings, and show up in its metrics.
+
+        :param str path: Capture file path
+        :param float speed: Timing factor. 1 is the captured pace, 0 sends
+            them as fast as possible.
+        :param bool offline: Answer with the captured responses instead of
+            calling Banlingkit
+        :raises UserError: When replaying against the production API
+        :return dict: Replay summary with the carrier metrics
+        """
+        self.ensure_one()
+        if not offline and self.prod_environment:
+            raise UserError(
+                _("Captures can only be sent to the Banlingkit test environment.")
+            )
+        records = [
+            r
+            for r in load_capture(path)
+            if r["operation"] in ("manifest_shipping", "manifest_shipping_bulk")
+        ]
+        values = {f: self[f] for f in BL_CONNECTION_FIELDS}
+        # Don't capture the replayed traffic again
+        values["banlingkit_capture"] = False
+        bl_request = self._bl_build_request(values)
+        if offline:
+            bl_request.session = ReplaySession(records)
+        errors = []
+
+        def send(record):
+            try:
+                responses = self._banlingkit_create_shippings(
+                    record["json"] or [], bl_request
+                )
+            except Exception as e:
+                errors.append(str(e))
+                return
+            errors.extend(error for error, *_rest in responses if error)
+
+        count, elapsed = replay(records, send, speed)
+        return {
+            "requests": count,
+            "errors": len(errors),
+            "elapsed": elapsed,
+            "metrics": self.banlingkit_get_metrics(),
+        }
+
+    @api.model
+    def _bl_parse_rate_limits(self, values):
+        """Get the rate limits per operation from the carrier values
+
+        :param dict values: Carrier connection values
+        :return dict: {operation: (rate, burst)}
+        """
+        rate_limits = {
+            "default": (values["banlingkit_rate_limit"], values["banlingkit_rate_burst"])
+        }
+        for line in (values["banlingkit_rate_limit_endpoints"] or "").splitlines():
+            if not line.strip():
+                continue
+            operation, _sep, limit = line.partition("=")
+            rate, _sep, burst = limit.partition("/")
+            try:
+                rate_limits[operation.strip()] = (
+                    float(rate),
+                    int(burst or values["banlingkit_rate_burst"]),
+                )
+            except ValueError:
+                _logger.warning("Wrong Banlingkit rate limit line: %s", line)
+        return rate_limits
+
+    @tools.ormcache("self.id", "self.prod_environment")
+    def _bl_request_cached(self):
+        """Build the request object once per carrier and environment
+
+        :return BanlingkitExpressRequest: Banlingkit Express Request object
+        """
+        values = self.sudo().read(BL_CONNECTION_FIELDS)[0]
+        return self._bl_build_request(values)
+
+    def _bl_request(self):
+        """Get Banlingkit Request object
+
+        Unsaved records (onchanges) aren't cached as their values can differ
+        from the stored ones.
+
+        :return BanlingkitExpressRequest: Banlingkit Express Request object
+        """
+        self.ensure_one()
+        if not isinstance(self.id, int):
+            return self._bl_build_request({f: self[f] for f in BL_CONNECTION_FIELDS})
+        return self._bl_request_cached()
+
+    def banlingkit_get_metrics(self):
+        """Metrics of the carrier account API calls in the current worker
+
+        :return dict: {operation: stats}
+        """
+        self.ensure_one()
+        account = self._bl_request().cid
+        result = metrics.snapshot(account).get(account, {})
+        for operation, state in breakers_snapshot(account).get(account, {}).items():
+            result.setdefault(operation, {})["circuit"] = state
+        return result
 
     @api.model
     def _bl_log_request(self, bl_request):
@@ -89,8 +484,14 @@ class DeliveryCarrier(models.Model):
 
         :param bl_request bl_request: Banlingkit Express request object
         """
-        print("banlingkit cct_request")
-        print(bl_request)
+        # The request and response are serialized when read, so only do it
+        # when they're logged
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug("Banlingkit request: %s", bl_request.bl_last_request)
+            _logger.debug("Banlingkit response: %s", bl_request.bl_last_response)
+        for carrier in self.filtered("debug_logging"):
+            carrier.log_xml(bl_request.bl_last_request or "", "banlingkit_request")
+            carrier.log_xml(bl_request.bl_last_response or "", "banlingkit_response")
 
     def _bl_check_error(self, error):
         """Common error checking. We stop the program when an error is returned.
@@ -98,7 +499,6 @@ class DeliveryCarrier(models.Model):
         :param list error: List of tuples in the form of (code, description)
         :raises UserError: Prompt the error to the user
         """
-        print(error)
         return
 
     @api.model
@@ -159,170 +559,435 @@ class DeliveryCarrier(models.Model):
         error = bl_request.validate_user()
         self._bl_log_request(bl_request)
 
+    @api.model
+    def _banlingkit_prefetch_shipping(self, pickings):
+        """Load every field used in the shipping payloads for a whole batch
+
+        Each `mapped` call reads a field for all the records at once, so the
+        number of queries doesn't depend on the number of pickings or moves.
+
+        :param recordset pickings: `stock.picking` recordset
+        """
+        pickings.mapped("name")
+        pickings.mapped("sale_id.name")
+        pickings.mapped("company_id.currency_id.name")
+        partners = pickings.mapped("partner_id")
+        partners |= partners.mapped("commercial_partner_id")
+        partners.mapped("country_id.name")
+        partners.mapped("state_id.name")
+        moves = pickings.mapped("move_ids")
+        moves.mapped("product_uom_qty")
+        products = moves.mapped("product_id")
+        products.mapped("declared_name_en")
+        products.mapped("declared_name_cn")
+        products.mapped("default_code")
+        products.mapped("list_price")
+
+    def _prepare_banlingkit_shipping_batch(self, pickings):
+        """Convert many pickings values for Banlingkit Express API at once
+
+        :param recordset pickings: `stock.picking` recordset
+        :return dict: `stock.picking` record -> values prepared for the
+            Banlingkit connector
+        """
+        self.ensure_one()
+        self._banlingkit_prefetch_shipping(pickings)
+        currency = {}
+        payloads = {}
+        for picking in pickings:
+            recipient = picking.partner_id
+            recipient_entity = recipient.commercial_partner_id
+            reference = picking.name
+            if picking.sale_id:
+                reference = "{}-{}".format(picking.sale_id.name, reference)
+
+            # https://note.youdao.com/ynoteshare/index.html?id=ae42953f52c03008f1ecdd073e5d4032&type=note&_time=1680855653628
+
+            # Get the product name and quantity and the invoice price in a
+            # single pass over the moves.
+            goodslist = []
+            invoice_price = 0.0
+            for move in picking.move_ids:
+                product = move.product_id
+                goodslist.append(
+                    {
+                        "declaredEnSpecification": product.declared_name_en,
+                        "declaredEnName": product.declared_name_en,
+                        "declaredSpecification": product.declared_name_cn,
+                        "declaredName": product.declared_name_cn,
+                        "quantity": move.product_uom_qty,
+                        "barCode": product.default_code,
+                    }
+                )
+                invoice_price += product.list_price * move.product_uom_qty
+            company = picking.company_id
+            if company not in currency:
+                currency[company] = company.currency_id.name
+
+            payloads[picking] = {
+                "storehouseCode": "ST00002",
+                # strplace the reference "/" with "-"
+                "sourceCode": reference.replace("/", "-"),
+                "currency": currency[company],
+                # order amount
+                "invoicePrice": invoice_price,
+                "needPack": False,
+                "consignee": recipient.name or recipient_entity.name,
+                "tel": str(recipient.phone or recipient_entity.phone or ""),
+                "contry": recipient.country_id.name,
+                "province": recipient.state_id.name,
+                "city": recipient.city,
+                "detail": recipient.street,
+                "postCode": recipient.zip,
+                "email": str(recipient.email or recipient_entity.email or ""),
+                "comments": None,  # Optional
+                "items": goodslist,
+            }
+        return payloads
+
     def _prepare_banlingkit_shipping(self, picking):
         """Convert picking values for Banlingkit Express API
 
         :param record picking: `stock.picking` record
         :return dict: Values prepared for the Banlingkit connector
         """
-        self.ensure_one()
-        # A picking can be delivered from any warehouse
-        sender_partner = picking.company_id.partner_id
-        if picking.picking_type_id:
-            sender_partner = (
-                picking.picking_type_id.warehouse_id.partner_id
-                or picking.company_id.partner_id
-            )
-        recipient = picking.partner_id
-        recipient_entity = picking.partner_id.commercial_partner_id
-        weight = picking.shipping_weight
-        reference = picking.name
-        if picking.sale_id:
-            reference = "{}-{}".format(picking.sale_id.name, reference)
-
-        # https://note.youdao.com/ynoteshare/index.html?id=ae42953f52c03008f1ecdd073e5d4032&type=note&_time=1680855653628
-
-        goodslist = []
-        # Get the product name and quantity from the picking
-        for move in picking.move_ids:
-            # get the product name and quantity from the picking
-            goodslist.append(
-                {
-                    "declaredEnSpecification": move.product_id.declared_name_en,
-                    "declaredEnName": move.product_id.declared_name_en,
-                    "declaredSpecification": move.product_id.declared_name_cn,
-                    "declaredName": move.product_id.declared_name_cn,
-                    "quantity": move.product_uom_qty,
-                    "barCode": move.product_id.default_code,
-                }
-            )
+        return self._prepare_banlingkit_shipping_batch(picking)[picking]
 
+    def _banlingkit_check_picking(self, picking):
+        """Avoid sending twice the same shipping
+
+        :param record picking: `stock.picking` record
+        :raises UserError: When the picking is already sent with this carrier
+        """
+        if picking.carrier_tracking_ref and picking.carrier_id == self:
+            raise UserError(_("This picking already has a tracking number."))
 
-        # Get invoice Price from the picking
-        invoice_price = 0.0
-        for move in picking.move_ids:
-            # get the product name and quantity from the picking
-            invoice_price += move.product_id.list_price * move.product_uom_qty
+    def _banlingkit_render_label(self, picking, tracking, documents, bl_request):
+        """Get the label content for a new shipping
 
-        # strplace the reference "/" with "-"
-        sourceCode = reference.replace("/", "-")
+        When the API gives a document url we stream it into a temporary file.
+        Otherwise the label is rendered in-process, so there's no loopback
+        request to our own /delivery/print_label route.
 
+        :param record picking: `stock.picking` record
+        :param str tracking: Shipping code
+        :param str documents: Label url given by the API
+        :param BanlingkitExpressRequest bl_request: Request object
+        :return file: Binary file object with the label content
+        """
+        if documents:
+            label = tempfile.TemporaryFile()
+            bl_request.download_document(documents, label)
+            return label
+        if not picking.sale_id:
+            return False
+        options = self._banlingkit_label_options()
+        return io.BytesIO(
+            render_label(
+                picking,
+                tracking,
+                label_format=options["label_format"],
+                dpi=options["dpi"],
+            )
+        )
+
+    def _banlingkit_label_options(self):
+        """Settings of the labels rendered in Odoo
+
+        It's called on the picking carrier, so it works with an empty
+        recordset as well.
+
+        :return dict: `render_labels` keyword arguments
+        """
+        label_format = self.banlingkit_label_format or "pdf"
+        if label_format == "pdf":
+            label_format = (self.banlingkit_document_format or "PDF").lower()
         return {
-            "storehouseCode": "ST00002",
-            "sourceCode": sourceCode,
-            #"sourceCode": "SS00002",
-            "currency": picking.company_id.currency_id.name,
-            # order amount
-            "invoicePrice": invoice_price,
-            "needPack": False,
-            "consignee": recipient.name or recipient_entity.name,
-            "tel": str(recipient.phone or recipient_entity.phone or ''),
-            "contry": recipient.country_id.name,
-            "province": recipient.state_id.name,
-            "city": recipient.city,
-            "detail": recipient.street,
-            #"houseNumber": recipient.street2,
-            "postCode": recipient.zip,
-            "email": str(recipient.email or recipient_entity.email or ''),
-            "comments": None,  # Optional
-            "items": goodslist,
+            "label_format": label_format,
+            "model_code": self.banlingkit_document_model_code or "SINGLE",
+            "offset": self.banlingkit_document_offset or 0,
+            "dpi": self.banlingkit_label_dpi or LABEL_DPI,
         }
 
+    @api.model
+    def _banlingkit_stream_attachment(self, vals, stream, checksum=None):
+        """Create an attachment from a file without loading it whole in memory
 
-    def banlingkit_send_shipping(self, pickings):
-        """Banlingkit Express wildcard method called when a picking is confirmed
+        The filestore is addressed by checksum, so the file is only written
+        when its content is new.
+
+        :param dict vals: `ir.attachment` values
+        :param file stream: Binary file object with the content
+        :param tuple checksum: (sha1 hex digest, size) when already known
+        :return record: `ir.attachment` record
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        if not checksum:
+            stream.seek(0)
+        checksum, size = checksum or self._banlingkit_checksum(stream)
+        if Attachment._storage() != "file":
+            return Attachment.create(dict(vals, raw=stream.read()))
+        # Same layout as ir.attachment._get_path
+        fname = checksum[:2] + "/" + checksum
+        full_path = Attachment._full_path(fname)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "wb") as target:
+                shutil.copyfileobj(stream, target, LABEL_CHUNK_SIZE)
+            # Like `_file_write`: the file is collected if the transaction
+            # is rolled back
+            Attachment._mark_for_gc(fname)
+        # `create` drops the storage values, so they're set afterwards
+        attachment = Attachment.create(vals)
+        attachment.flush_recordset()
+        self.env.cr.execute(
+            """
+            UPDATE ir_attachment
+            SET store_fname = %s, checksum = %s, file_size = %s
+            WHERE id = %s
+            """,
+            (fname, checksum, size, attachment.id),
+        )
+        attachment.invalidate_recordset(
+            ["store_fname", "checksum", "file_size", "raw", "datas"]
+        )
+        return attachment
+
+    @api.model
+    def _banlingkit_checksum(self, stream):
+        """Checksum of a file read in chunks. The file is rewound afterwards.
+
+        :param file stream: Binary file object
+        :return tuple: (sha1 hex digest, size)
+        """
+        sha = hashlib.sha1()
+        size = 0
+        for chunk in iter(lambda: stream.read(LABEL_CHUNK_SIZE), b""):
+            sha.update(chunk)
+            size += len(chunk)
+        stream.seek(0)
+        return sha.hexdigest(), size
+
+    def _banlingkit_attach_label(
+        self, picking, name, label, url=False, mimetype="application/pdf"
+    ):
+        """Attach a label to a picking without loading it whole in memory
+
+        The picking only gets one attachment for the same content.
+
+        :param record picking: `stock.picking` record
+        :param str name: Attachment name
+        :param file label: Binary file object with the label content
+        :param str url: Label origin url
+        :param str mimetype: Label content type
+        :return record: `ir.attachment` record
+        """
+        checksum = self._banlingkit_checksum(label)
+        attachment = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", "stock.picking"),
+                    ("res_id", "=", picking.id),
+                    ("checksum", "=", checksum[0]),
+                ],
+                limit=1,
+            )
+        )
+        if attachment:
+            return attachment
+        return self._banlingkit_stream_attachment(
+            {
+                "name": name,
+                "res_model": "stock.picking",
+                "res_id": picking.id,
+                "type": "binary",
+                "mimetype": mimetype,
+                "url": url,
+            },
+            label,
+            checksum,
+        )
+
+    def _banlingkit_apply_shipping(self, picking, vals, tracking, documents, label):
+        """Write the shipping results back into the picking
+
+        :param record picking: `stock.picking` record
+        :param dict vals: Shipping values sent to the API
+        :param str tracking: Shipping code given by the API
+        :param str documents: Label url
+        :param file label: Binary file object with the label content
+        :return dict: Values expected by `send_shipping`
+        """
+        vals.update(
+            {
+                "tracking_number": tracking,
+                "exact_price": 0,
+                "carrier_tracking_ref": tracking,
+            }
+        )
+        # save the tracking number to carrier_tracking_ref field
+        picking.carrier_tracking_ref = tracking
+        if label:
+            # Labels given by the API are PDF documents
+            label_format = "pdf"
+            if not documents:
+                label_format = self._banlingkit_label_options()["label_format"]
+            with label:
+                self._banlingkit_attach_label(
+                    picking,
+                    "{}.{}".format(tracking, label_format),
+                    label,
+                    documents or False,
+                    LABEL_MIMETYPES[label_format],
+                )
+        # We post an extra message in the chatter with the barcode and the
+        # label because there's clean way to override the one sent by core.
+        body = _("Banlingkit Shipping Documents")
+        picking.message_post(body=body)
+        picking.sale_id.shipping_time = fields.Datetime.now()
+        return vals
+
+    def _banlingkit_shipping_failed(self, picking, vals, error):
+        """Report a shipping that couldn't be sent without stopping the batch
+
+        :param record picking: `stock.picking` record
+        :param dict vals: Shipping values sent to the API
+        :param list error: List of tuples in the form of (code, description)
+        :return dict: Values expected by `send_shipping`
+        """
+        message = "\n".join("[{}] {}".format(*e) for e in error)
+        _logger.warning("Banlingkit shipping %s failed: %s", vals["sourceCode"], message)
+        picking.message_post(body=_("Banlingkit Express shipping error: %s") % message)
+        vals.update({"tracking_number": False, "exact_price": 0})
+        return vals
+
+    def _banlingkit_prepare_batch(self, pickings):
+        """Check the pickings and prepare their payloads in the main thread
 
         :param record pickings: `stock.picking` recordset
-        :raises UserError: On any API error
-        :return dict: With tracking number and delivery price (always 0)
+        :return list: Shipping values in pickings order
         """
-        bl_request = self._bl_request()
-        print("banlingkit_send_shipping")
-        print(bl_request)
-        result = []
         for picking in pickings:
+            self._banlingkit_check_picking(picking)
+        payloads = self._prepare_banlingkit_shipping_batch(pickings)
+        return [payloads[picking] for picking in pickings]
 
-            # Check if the picking is already shipped
-            # if picking.state == "done":
-            #     raise UserError(_("This picking is already shipped."))
-            
-            # check if the picking has a tracking number and the same carrier
-            if picking.carrier_tracking_ref and picking.carrier_id == self:
-                raise UserError(_("This picking already has a tracking number."))
+    def _banlingkit_create_shippings(self, payloads, bl_request):
+        """Create the shippings at Banlingkit. Only the API is called.
 
+        Every shipping gets its own result, so a failed one doesn't stop the
+        rest. With several payloads they're packed in chunked bulk requests
+        or sent over a bounded thread pool, as the carrier is configured.
+        The workers never touch the cursor.
 
-            vals = self._prepare_banlingkit_shipping(picking)
-            print("banlingkit_send_shipping vals")
-            print(vals)
-        
+        :param list payloads: Shipping values prepared from Odoo
+        :param BanlingkitExpressRequest bl_request: Request object
+        :return list: (errors, documents url, tracking, label file or None)
+            in payloads order
+        """
+        if len(payloads) > 1 and self.banlingkit_bulk_send:
             try:
-                error, documents, tracking = bl_request.manifest_shipping(shipping_values=vals)
-                self._bl_check_error(error)
-            except Exception as e:
-                raise (e)
+                responses = bl_request.manifest_shipping_bulk(
+                    payloads, chunk_size=self.banlingkit_bulk_chunk_size
+                )
             finally:
                 self._bl_log_request(bl_request)
-                #return result
-                print("banlingkit_send_shipping finally" + str(bl_request))
-                print("banlingkit_send_shipping finally" + str(error))
+            return [
+                responses.get(
+                    vals["sourceCode"], ([("", _("No response"))], "", "")
+                )
+                + (None,)
+                for vals in payloads
+            ]
 
-            print(tracking)
-            print(documents)
+        def submit(vals):
+            try:
+                _error, documents, tracking = bl_request.manifest_shipping(
+                    shipping_values=vals
+                )
+            except Exception as e:
+                return [("", str(e))], "", "", None, bl_request.last_record
+            record = bl_request.last_record
+            label = None
+            if documents:
+                # The shipping exists already: a failed download is retried
+                # when the label is attached
+                try:
+                    label = tempfile.TemporaryFile()
+                    bl_request.download_document(documents, label)
+                except Exception as e:
+                    _logger.warning("Banlingkit label %s failed: %s", tracking, e)
+                    label = None
+            return [], documents, tracking, label, record
 
-            if tracking:
-                vals.update({"carrier_tracking_ref": tracking})
+        workers = min(max(self.banlingkit_concurrency, 1), len(payloads))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(submit, payloads))
+        else:
+            responses = [submit(vals) for vals in payloads]
+        result = []
+        for error, documents, tracking, label, record in responses:
+            # The last call of a thread is only known in that thread
+            bl_request.last_record = record
+            self._bl_log_request(bl_request)
+            result.append((error, documents, tracking, label))
+        return result
 
-            # if documents is empty, we need to use the default url
-            if not documents:
-                documents = "/delivery/print_label?tracking_no={}".format(
-                    tracking
-                )
-                base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
-                documents = base_url.rstrip('/') + documents
-                print("documents", documents)
+    def _banlingkit_finish_shipping(self, picking, vals, response, bl_request):
+        """Label and chatter of a shipping already created at Banlingkit
 
+        :param record picking: `stock.picking` record
+        :param dict vals: Shipping values sent to the API
+        :param tuple response: Result given by `_banlingkit_create_shippings`
+        :param BanlingkitExpressRequest bl_request: Request object
+        :return dict: Values expected by `send_shipping`
+        """
+        _error, documents, tracking, label = response
+        if not label:
+            label = self._banlingkit_render_label(
+                picking, tracking, documents, bl_request
+            )
+        return self._banlingkit_apply_shipping(
+            picking, vals, tracking, documents, label
+        )
 
-            vals.update({"tracking_number": tracking, "exact_price": 0})
-            vals.update({"carrier_tracking_ref": tracking})
-            # save the tracking number to carrier_tracking_ref field
-            picking.carrier_tracking_ref = tracking
+    def banlingkit_send_shipping(self, pickings):
+        """Banlingkit Express wildcard method called when a picking is confirmed
 
-            # save the tracking number to carrier_tracking_ref field
-            picking.carrier_tracking_ref = tracking
-            picking.update({"carrier_tracking_ref": tracking})
+        Several pickings only come together from the shipments queue. Then
+        a failed shipping doesn't abort the rest: the error is posted in its
+        picking chatter and it's returned without tracking number.
 
-            # if documents is a url, we need to download the file and save it as an attachment 
-            attachment = False
-            if documents:
-                response = requests.get(documents)
-                print("response", response.status_code)
-                if response.status_code != 200:
-                    raise Exception("Error in request")
-                pdf_content = response.content
-                
-                attachment = self.env['ir.attachment'].create({
-                    'name': tracking + '.pdf',
-                    'datas': base64.b64encode(pdf_content),
-                    'db_datas': base64.b64encode(pdf_content),
-                    'res_model': 'stock.picking',  # Attach to the stock.picking
-                    'res_id': pickings.id,  # Attach to the current picking
-                    'type': 'binary',
-                    'mimetype': 'application/pdf',
-                    'url': documents,
-                })
-
-            # The default shipping method doesn't allow to configure the label
-            # format, so once we get the tracking, we ask for it again.
-            #documents = self.banlingkit_get_label(tracking)
-            # We post an extra message in the chatter with the barcode and the
-            # label because there's clean way to override the one sent by core.
-            
-            body = _("Banlingkit Shipping Documents")
-            picking.message_post(body=body)
-
-            picking.sale_id.shipping_time = fields.Datetime.now()
-
-            result.append(vals)
+        :param record pickings: `stock.picking` recordset
+        :raises UserError: On any API error of a single picking
+        :return list: Dicts with tracking number and delivery price (always 0)
+        """
+        # Shippings already created by the queue, handed to `send_to_shipper`
+        # so core prices and posts them
+        sent = self.env.context.get("banlingkit_shipping_results") or {}
+        if pickings and all(picking.id in sent for picking in pickings):
+            return [sent[picking.id] for picking in pickings]
+        bl_request = self._bl_request()
+        payloads = self._banlingkit_prepare_batch(pickings)
+        responses = self._banlingkit_create_shippings(payloads, bl_request)
+        result = []
+        for picking, vals, response in zip(pickings, payloads, responses):
+            error, _documents, tracking, _label = response
+            if error or not tracking:
+                error = error or [("", _("No tracking number received"))]
+                if len(pickings) == 1:
+                    raise UserError(
+                        _("Banlingkit Express shipping error: %s")
+                        % "\n".join("[{}] {}".format(*e) for e in error)
+                    )
+                result.append(self._banlingkit_shipping_failed(picking, vals, error))
+                continue
+            result.append(
+                self._banlingkit_finish_shipping(picking, vals, response, bl_request)
+            )
         return result
 
     def banlingkit_cancel_shipment(self, pickings):
@@ -342,33 +1007,167 @@ class DeliveryCarrier(models.Model):
                 self._bl_log_request(bl_request)
         return True
 
-    def banlingkit_get_label(self, reference):
-        """Generate label for picking
+    def banlingkit_get_labels(self, references):
+        """Get the labels of many shippings in a single document when possible
 
-        :param str reference: shipping reference
-        :returns tuple: (file_content, file_name)
+        PDF documents of every chunk are merged in the references order.
+        Images can't be merged, so one file per chunk is returned.
+
+        :param list references: Shipping references
+        :returns list: [(file_name, file_content)]
         """
-        if not self:
-            return False
-        if not reference:
-            return False
         self.ensure_one()
+        references = [r for r in references if r]
+        if not references:
+            return []
         bl_request = self._bl_request()
         try:
-            error, label = bl_request.get_documents_multi(
-                reference,
+            documents = bl_request.get_documents_chunked(
+                references,
                 model_code=self.banlingkit_document_model_code,
                 kind_code=self.banlingkit_document_format,
                 offset=self.banlingkit_document_offset,
+                workers=self.banlingkit_concurrency,
             )
-            self._bl_check_error(error)
-        except Exception as e:
-            raise (e)
         finally:
             self._bl_log_request(bl_request)
-        if not label:
+        extension = (self.banlingkit_document_format or "PDF").lower()
+        name = references[0] if len(references) == 1 else "labels"
+        if extension == "pdf" and len(documents) > 1:
+            documents = [merge_pdf(documents)]
+        if len(documents) == 1:
+            return [("{}.{}".format(name, extension), documents[0])]
+        return [
+            ("{}-{}.{}".format(name, index, extension), document)
+            for index, document in enumerate(documents, 1)
+        ]
+
+    def banlingkit_get_label(self, reference):
+        """Generate label for picking
+
+        :param str reference: shipping reference
+        :returns list: [(file_name, file_content)]
+        """
+        if not self:
+            return False
+        if not reference:
             return False
-        return label
+        self.ensure_one()
+        return self.banlingkit_get_labels([reference]) or False
+
+    def _banlingkit_merge_tracking_history(self, history, trackings):
+        """Add tracking lines to a history keeping it sorted by date
+
+        Late events are inserted where their date belongs instead of being
+        appended. Lines without a date are left where they are.
+
+        :param str history: Current tracking history
+        :param list trackings: New tracking dicts, oldest first
+        :return str: Tracking history
+        """
+
+        def line_date(line):
+            try:
+                return fields.Datetime.to_datetime(line[:19])
+            except ValueError:
+                return None
+
+        lines = history.split("\n") if history else []
+        for tracking in trackings:
+            index = len(lines)
+            when = tracking["StatusDateTime"]
+            while when and index and (line_date(lines[index - 1]) or when) > when:
+                index -= 1
+            lines.insert(index, self._banlingkit_format_tracking(tracking))
+        return "\n".join(lines)
+
+    def _banlingkit_tracking_changes(self, picking, trackings):
+        """Find the tracking events not stored yet for a picking
+
+        The fingerprint of the latest stored event lets us skip the unchanged
+        shippings without reading their events. Pushes can bring events
+        older than the stored ones: they're stored, but the picking state
+        only follows the newest event.
+
+        :param record picking: `stock.picking` record
+        :param list trackings: Tracking dicts, oldest first
+        :return tuple: (new events values, picking values) or None when
+            there are no new events
+        """
+        if not trackings:
+            return None
+        Event = self.env["banlingkit.tracking.event"]
+        fingerprints = [Event._fingerprint(t) for t in trackings]
+        last_fingerprint = picking.banlingkit_tracking_fingerprint
+        if fingerprints[-1] == last_fingerprint:
+            return None
+        # The newest stored event, when it isn't among the given ones
+        stored_tracking = None
+        if last_fingerprint in fingerprints:
+            new_trackings = trackings[fingerprints.index(last_fingerprint) + 1 :]
+        else:
+            stored = [
+                {
+                    "StatusDateTime": e.event_datetime,
+                    "StatusCode": e.status_code or "",
+                    "IncidentCode": e.incident_code or "",
+                }
+                for e in picking.banlingkit_tracking_event_ids
+            ]
+            known = {Event._fingerprint(t) for t in stored}
+            new_trackings = [
+                t for t, f in zip(trackings, fingerprints) if f not in known
+            ]
+            if stored:
+                stored_tracking = max(
+                    stored, key=lambda t: t["StatusDateTime"] or datetime.min
+                )
+        if not new_trackings:
+            return None
+        events = [
+            {
+                "picking_id": picking.id,
+                "event_datetime": tracking["StatusDateTime"],
+                "status_code": tracking["StatusCode"],
+                "incident_code": tracking["IncidentCode"] or False,
+            }
+            for tracking in new_trackings
+        ]
+        history = self._banlingkit_merge_tracking_history(
+            picking.tracking_state_history, new_trackings
+        )
+        picking_vals = {"tracking_state_history": history}
+        current_tracking = new_trackings[-1]
+        if stored_tracking and (
+            stored_tracking["StatusDateTime"] or datetime.min
+        ) > (current_tracking["StatusDateTime"] or datetime.min):
+            # Late events: the current state is still the stored one
+            return events, picking_vals
+        picking_vals.update(
+            {
+                "banlingkit_tracking_fingerprint": Event._fingerprint(
+                    current_tracking
+                ),
+                "tracking_state": self._banlingkit_format_tracking(current_tracking),
+                "delivery_state": BANLINGKIT_DELIVERY_STATES_STATIC.get(
+                    current_tracking["StatusCode"], "incidence"
+                ),
+            }
+        )
+        return events, picking_vals
+
+    def _banlingkit_apply_tracking(self, picking, trackings):
+        """Store the new tracking events of the picking, if any
+
+        :param record picking: `stock.picking` record
+        :param list trackings: Tracking dicts, oldest first
+        """
+        changes = self._banlingkit_tracking_changes(picking, trackings)
+        if not changes:
+            return
+        events, picking_vals = changes
+        self.env["banlingkit.tracking.event"].create(events)
+        picking.write(picking_vals)
 
     def banlingkit_tracking_state_update(self, picking):
         """Wildcard method for Banlingkit Express tracking followup
@@ -382,16 +1181,106 @@ class DeliveryCarrier(models.Model):
         try:
             error, trackings = bl_request.get_tracking(picking.carrier_tracking_ref)
             self._bl_check_error(error)
-        except Exception as e:
-            raise (e)
         finally:
             self._bl_log_request(bl_request)
-        picking.tracking_state_history = "\n".join(
-            [self._banlingkit_format_tracking(tracking) for tracking in trackings]
+        self._banlingkit_apply_tracking(picking, trackings)
+
+    def _banlingkit_refresh_tracking(self, pickings):
+        """Refresh the tracking of many pickings of this carrier
+
+        Shipping codes are queried in chunks, and the chunks run over a bounded
+        thread pool. Results are written in the main thread.
+
+        :param recordset pickings: `stock.picking` recordset
+        """
+        self.ensure_one()
+        bl_request = self._bl_request()
+        by_reference = {p.carrier_tracking_ref: p for p in pickings}
+        chunks = list(bl_request._chunks(list(by_reference), BL_TRACKING_CHUNK_SIZE))
+        if not chunks:
+            return
+
+        def fetch(chunk):
+            try:
+                return bl_request.get_tracking_multi(chunk)
+            except Exception as e:
+                return [("", str(e))], {}
+
+        workers = max(min(self.banlingkit_concurrency, len(chunks)), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(fetch, chunks))
+        new_events = []
+        for error, trackings in responses:
+            if error:
+                _logger.warning("Banlingkit tracking refresh failed: %s", error)
+            for reference, events in trackings.items():
+                picking = by_reference.get(reference)
+                changes = picking and self._banlingkit_tracking_changes(
+                    picking, events
+                )
+                if not changes:
+                    continue
+                new_events += changes[0]
+                picking.write(changes[1])
+        # A single insert for the whole refresh
+        self.env["banlingkit.tracking.event"].create(new_events)
+
+    @api.model
+    def _cron_banlingkit_tracking_refresh(self, limit=None):
+        """Refresh the tracking of the Banlingkit shippings still on their way
+
+        :param int limit: Maximum pickings refreshed in this run
+        """
+        pickings = self.env["stock.picking"].search(
+            [
+                ("delivery_type", "=", "banlingkit"),
+                ("carrier_tracking_ref", "!=", False),
+                ("state", "=", "done"),
+                ("delivery_state", "not in", BANLINGKIT_FINAL_STATES),
+            ],
+            limit=limit,
+        )
+        by_carrier = {}
+        for picking in pickings:
+            by_carrier.setdefault(picking.carrier_id, []).append(picking.id)
+        now = fields.Datetime.now()
+        for carrier, picking_ids in by_carrier.items():
+            carrier_pickings = pickings.browse(picking_ids)
+            if carrier.banlingkit_tracking_push:
+                # Pushed shippings are only polled once they go silent
+                silence = timedelta(hours=carrier.banlingkit_tracking_silence)
+                silent_since = now - silence
+                carrier_pickings = carrier_pickings.filtered(
+                    lambda p: (p.banlingkit_tracking_push_date or p.date_done or now)
+                    <= silent_since
+                )
+            if carrier_pickings:
+                carrier._banlingkit_refresh_tracking(carrier_pickings)
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    @api.model
+    def _banlingkit_push_carrier(self, cid, salt):
+        """Carrier authenticated by the credentials of a tracking push
+
+        :param str cid: API client id
+        :param str salt: API salt
+        :return record: `delivery.carrier` record or an empty recordset
+        """
+        if not cid or not salt:
+            return self.browse()
+        carriers = self.sudo().search(
+            [
+                ("delivery_type", "=", "banlingkit"),
+                ("banlingkit_tracking_push", "=", True),
+            ]
         )
-        current_tracking = trackings.pop()
-        picking.tracking_state = self._banlingkit_format_tracking(current_tracking)
-        
+        for carrier in carriers:
+            bl_request = carrier._bl_request()
+            if bl_request.cid == cid and hmac.compare_digest(
+                str(bl_request.salt or ""), str(salt)
+            ):
+                return carrier
+        return self.browse()
 
     def banlingkit_get_tracking_link(self, picking):
         """Wildcard method for Banlingkit Express tracking link.
@@ -1,12 +1,53 @@
 # Copyright 2022 Tecnativa - David Vidal
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import _, models
+from odoo import _, fields, models
 
 
 class StockPicking(models.Model):
     _inherit = "stock.picking"
 
+    banlingkit_tracking_event_ids = fields.One2many(
+        comodel_name="banlingkit.tracking.event",
+        inverse_name="picking_id",
+        string="Banlingkit tracking events",
+        readonly=True,
+    )
+    banlingkit_tracking_fingerprint = fields.Char(
+        readonly=True,
+        copy=False,
+        help="Fingerprint of the latest tracking event received",
+    )
+    banlingkit_tracking_push_date = fields.Datetime(
+        readonly=True,
+        copy=False,
+        help="Last time Banlingkit pushed tracking events of this shipping",
+    )
+
+    def send_to_shipper(self):
+        """Queue the shipping when the carrier works asynchronously"""
+        self.ensure_one()
+        sent = self.env.context.get("banlingkit_shipping_results") or {}
+        if (
+            self.delivery_type == "banlingkit"
+            and self.carrier_id.banlingkit_async_send
+            and self.id not in sent
+        ):
+            self.env["banlingkit.shipment.job"]._enqueue(self)
+            return
+        return super().send_to_shipper()
+
+    def _banlingkit_shipping_sent(self, vals):
+        """Let core price and post a shipping created by the queue
+
+        `send_to_shipper` gets the values from `banlingkit_send_shipping`,
+        which hands back the given ones instead of calling the API.
+
+        :param dict vals: Values returned by `send_shipping` for this picking
+        """
+        self.ensure_one()
+        self.with_context(banlingkit_shipping_results={self.id: vals}).send_to_shipper()
+
     def banlingkit_get_label(self):
         """Get label for current picking
 
@@ -1,2 +1,12 @@
 # Disabled as the provider's test environment isn't stable enough
 # from . import test_delivery_banlingkit
+from . import test_banlingkit_benchmark
+from . import test_banlingkit_attachment
+from . import test_banlingkit_tracking
+from . import test_banlingkit_resilience
+from . import test_banlingkit_performance
+from . import test_banlingkit_label
+from . import test_banlingkit_tracking_push
+from . import test_banlingkit_shipment_job
+from . import test_banlingkit_capture
+from . import test_banlingkit_bulk
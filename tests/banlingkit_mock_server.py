@@ -0,0 +1,152 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Local stand-in of the Banlingkit services for offline tests and benchmarks"""
+import base64
+import gzip
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from reportlab.pdfgen import canvas
+
+
+def _minimal_pdf(text):
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(425, 227))
+    c.drawString(10, 100, text)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+class BanlingkitMockServer:
+    """Threaded HTTP server answering like the Banlingkit endpoints
+
+    :param float latency: Seconds every answer is delayed
+    :param float error_rate: Share of requests answered with a 500 error
+    :param float rate_limit: Requests per second before answering 429.
+        0 disables the throttling.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.requests = []
+        self.pdf = _minimal_pdf("Banlingkit label")
+        self._lock = threading.Lock()
+        self._window = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                return
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def do_PUT(self):
+                server._handle(self, "PUT")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _throttled(self):
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                return True
+            self._window.append(now)
+        return False
+
+    def _reply(self, handler, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler, method):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        payload = handler.rfile.read(length) if length else b""
+        with self._lock:
+            self.requests.append((method, parsed.path, len(payload)))
+        if handler.headers.get("Content-Encoding") == "gzip":
+            payload = gzip.decompress(payload)
+        if self.latency:
+            time.sleep(self.latency)
+        if self._throttled():
+            return self._reply(handler, 429, {"code": 429, "msg": "Too many requests"})
+        with self._lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            return self._reply(handler, 500, {"code": 500, "msg": "Server error"})
+        query = parse_qs(parsed.query)
+        if parsed.path == "/invoice/create":
+            shippings = json.loads(payload or b"[]")
+            return self._reply(
+                handler,
+                200,
+                {
+                    "code": 1,
+                    "data": [
+                        {"sourceCode": s.get("sourceCode"), "code": 1}
+                        for s in shippings
+                    ],
+                },
+            )
+        if parsed.path == "/tracks/query":
+            nums = (query.get("nums") or [""])[0].split(",")
+            return self._reply(
+                handler,
+                200,
+                {
+                    "code": 1,
+                    "data": [
+                        {
+                            "num": num,
+                            "tracks": [
+                                {"time": "2024-01-01 10:00:00", "status": "1"},
+                                {"time": "2024-01-02 10:00:00", "status": "2"},
+                            ],
+                        }
+                        for num in nums
+                        if num
+                    ],
+                },
+            )
+        if parsed.path == "/BanlingkitPrint":
+            return self._reply(
+                handler,
+                200,
+                {"ErrorCode": 0, "Data": base64.b64encode(self.pdf).decode()},
+            )
+        if parsed.path.startswith("/label/"):
+            return self._reply(handler, 200, self.pdf, "application/pdf")
+        return self._reply(handler, 404, {"code": 404, "msg": "Not found"})
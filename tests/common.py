@@ -0,0 +1,113 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from odoo.tests import common
+
+
+class BanlingkitTestMixin:
+    """A Banlingkit carrier and helpers to build its shippings"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.shipping_product = cls.env["product.product"].create(
+            {"type": "service", "name": "Test Shipping costs", "list_price": 10.0}
+        )
+        cls.carrier = cls.env["delivery.carrier"].create(
+            dict(
+                {
+                    "name": "Banlingkit Express",
+                    "delivery_type": "banlingkit",
+                    "product_id": cls.shipping_product.id,
+                    "prod_environment": False,
+                    "banlingkit_api_cid": "TEST",
+                    "banlingkit_api_token": "test-salt",
+                },
+                **cls._carrier_values()
+            )
+        )
+
+    @classmethod
+    def _carrier_values(cls):
+        """Values of the test carrier on top of the default ones
+
+        :return dict: `delivery.carrier` values
+        """
+        return {}
+
+    @classmethod
+    def _create_picking(cls, **values):
+        """Outgoing picking of the carrier without moves
+
+        :return record: `stock.picking` record
+        """
+        picking_type = cls.env.ref("stock.picking_type_out")
+        return cls.env["stock.picking"].create(
+            dict(
+                {
+                    "partner_id": cls.env["res.partner"]
+                    .create({"name": "Mr. Odoo & Co."})
+                    .id,
+                    "picking_type_id": picking_type.id,
+                    "location_id": picking_type.default_location_src_id.id,
+                    "location_dest_id": cls.env.ref(
+                        "stock.stock_location_customers"
+                    ).id,
+                    "carrier_id": cls.carrier.id,
+                },
+                **values
+            )
+        )
+
+    @classmethod
+    def _create_shippings(cls, count, lines=1):
+        """Confirmed sale orders of the carrier, one partner each
+
+        :param int count: Orders created
+        :param int lines: Products of every order
+        :return recordset: `stock.picking` recordset of the orders
+        """
+        products = cls.env["product.product"].create(
+            [
+                {"type": "consu", "name": "Test product %s" % i, "list_price": 5.0}
+                for i in range(lines)
+            ]
+        )
+        partners = cls.env["res.partner"].create(
+            [
+                {
+                    "name": "Mr. Odoo & Co. %s" % i,
+                    "city": "Madrid",
+                    "zip": "28001",
+                    "street": "Calle de La Rua, 3",
+                    "country_id": cls.env.ref("base.es").id,
+                    "state_id": cls.env.ref("base.state_es_m").id,
+                }
+                for i in range(count)
+            ]
+        )
+        orders = (
+            cls.env["sale.order"]
+            .with_context(tracking_disable=True)
+            .create(
+                [
+                    {
+                        "partner_id": partner.id,
+                        "carrier_id": cls.carrier.id,
+                        "order_line": [
+                            (0, 0, {"product_id": product.id, "product_uom_qty": 2})
+                            for product in products
+                        ],
+                    }
+                    for partner in partners
+                ]
+            )
+        )
+        orders.action_confirm()
+        return orders.picking_ids
+
+
+class BanlingkitTestCase(BanlingkitTestMixin, common.TransactionCase):
+    pass
+
+
+class BanlingkitHttpCase(BanlingkitTestMixin, common.HttpCase):
+    pass
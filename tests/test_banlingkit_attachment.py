@@ -0,0 +1,137 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import hashlib
+import io
+from unittest import mock
+
+from odoo import fields
+from odoo.tests import tagged
+
+from ..models.banlingkit_request import BanlingkitExpressRequest
+from .common import BanlingkitTestCase
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitAttachment(BanlingkitTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.picking = cls._create_picking()
+        cls.partner = cls.picking.partner_id
+
+    def _set_storage(self, storage):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "ir_attachment.location", storage
+        )
+
+    def _assert_content(self, attachment, content):
+        self.assertEqual(attachment.raw, content)
+        self.assertEqual(attachment.checksum, hashlib.sha1(content).hexdigest())
+        self.assertEqual(attachment.file_size, len(content))
+
+    def test_stream_attachment_file_storage(self):
+        self._set_storage("file")
+        content = b"%PDF-1.4 Banlingkit label file storage"
+        attachment = self.carrier._banlingkit_stream_attachment(
+            {
+                "name": "label.pdf",
+                "res_model": "res.partner",
+                "res_id": self.partner.id,
+                "type": "binary",
+            },
+            io.BytesIO(content),
+        )
+        self.assertTrue(attachment.store_fname)
+        self._assert_content(attachment, content)
+        # Read back from the database, not from the cache
+        attachment.invalidate_recordset()
+        self._assert_content(attachment, content)
+
+    def test_stream_attachment_db_storage(self):
+        self._set_storage("db")
+        content = b"%PDF-1.4 Banlingkit label db storage"
+        attachment = self.carrier._banlingkit_stream_attachment(
+            {
+                "name": "label.pdf",
+                "res_model": "res.partner",
+                "res_id": self.partner.id,
+                "type": "binary",
+            },
+            io.BytesIO(content),
+        )
+        self.assertFalse(attachment.store_fname)
+        attachment.invalidate_recordset()
+        self._assert_content(attachment, content)
+
+    def test_attach_label(self):
+        self._set_storage("file")
+        content = b"%PDF-1.4 Banlingkit label"
+        attachment = self.carrier._banlingkit_attach_label(
+            self.picking, "TRACK01.pdf", io.BytesIO(content)
+        )
+        attachment.invalidate_recordset()
+        self._assert_content(attachment, content)
+        self.assertEqual(attachment.res_model, "stock.picking")
+        self.assertEqual(attachment.res_id, self.picking.id)
+        # The same content isn't attached twice
+        again = self.carrier._banlingkit_attach_label(
+            self.picking, "TRACK01.pdf", io.BytesIO(content)
+        )
+        self.assertEqual(again, attachment)
+
+    def _done_picking(self):
+        self.picking.carrier_tracking_ref = "TRACK01"
+        self.picking.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE stock_picking SET state = 'done', date_done = %s WHERE id = %s",
+            (fields.Datetime.now(), self.picking.id),
+        )
+        self.picking.invalidate_recordset()
+
+    def test_local_manifest(self):
+        self._set_storage("file")
+        self._done_picking()
+        for document_type in ("CSV", "XLSX"):
+            wizard = self.env["banlingkit.manifest.wizard"].create(
+                {
+                    "source": "local",
+                    "document_type": document_type,
+                    "carrier_ids": [(6, 0, self.carrier.ids)],
+                }
+            )
+            wizard.get_manifest()
+            self.assertEqual(wizard.state, "done")
+            self.assertEqual(len(wizard.attachment_ids), 1)
+            attachment = wizard.attachment_ids
+            attachment.invalidate_recordset()
+            self.assertTrue(attachment.raw)
+            self._assert_content(attachment, attachment.raw)
+            if document_type == "CSV":
+                lines = attachment.raw.decode("utf-8").splitlines()
+                self.assertTrue(lines[0].startswith("Account,"))
+                self.assertEqual(len(lines), 2)
+                self.assertIn("TRACK01", lines[1])
+            else:
+                # XLSX files are zip archives
+                self.assertTrue(attachment.raw.startswith(b"PK"))
+
+    def test_remote_manifest(self):
+        self._set_storage("file")
+        content = b"%PDF-1.4 Banlingkit manifest"
+        wizard = self.env["banlingkit.manifest.wizard"].create(
+            {
+                "source": "remote",
+                "document_type": "PDF",
+                "carrier_ids": [(6, 0, self.carrier.ids)],
+            }
+        )
+        with mock.patch.object(
+            BanlingkitExpressRequest,
+            "report_shipping",
+            return_value=([], [("manifest.pdf", content)]),
+        ):
+            wizard.get_manifest()
+        self.assertEqual(wizard.state, "done")
+        attachment = wizard.attachment_ids
+        self.assertEqual(len(attachment), 1)
+        attachment.invalidate_recordset()
+        self._assert_content(attachment, content)
@@ -0,0 +1,270 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Offline benchmarks of the Banlingkit hot paths
+
+They run against a local stand-in of the Banlingkit services, so results
+are repeatable. Run them explicitly with the ``banlingkit_benchmark`` tag:
+
+    odoo -d db -u delivery_banlingkit --test-tags banlingkit_benchmark
+
+The size of the batches can be set with the ``BANLINGKIT_BENCH_N``
+environment variable. Every benchmark fails when it goes over its queries
+or time budget. The query budgets that don't depend on the machine are
+also checked by the standard tests (see `test_banlingkit_performance`).
+"""
+import io
+import logging
+import os
+import time
+from unittest import mock
+
+from odoo.tests import tagged
+
+from ..models import banlingkit_request
+from ..models.banlingkit_label import FONT_PATH, render_label, render_labels
+from ..models.banlingkit_metrics import metrics
+from ..models.banlingkit_warmup import IMPORT_TIME_BUDGET, measure_import_time
+from .banlingkit_mock_server import BanlingkitMockServer
+from .common import BanlingkitTestCase
+from .test_banlingkit_performance import PREPARE_BATCH_MAX_QUERIES
+
+_logger = logging.getLogger(__name__)
+
+BENCH_N = int(os.environ.get("BANLINGKIT_BENCH_N", 50))
+# Budgets the benchmarks fail over. Elapsed times are per item, generous
+# enough for a loaded CI runner against the local stand-in server.
+MAX_SECONDS_PER_ITEM = float(os.environ.get("BANLINGKIT_BENCH_MAX_SECONDS", 0.5))
+# Sending posts messages and attachments, so it's a coarse per item bound
+MAX_QUERIES_PER_ITEM = 40
+
+
+@tagged("-standard", "-at_install", "post_install", "banlingkit_benchmark")
+class TestBanlingkitBenchmark(BanlingkitTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = BanlingkitMockServer(
+            latency=float(os.environ.get("BANLINGKIT_BENCH_LATENCY", 0.02))
+        ).start()
+        cls.addClassCleanup(cls.server.stop)
+        patcher = mock.patch.dict(
+            banlingkit_request.BL_API_URL,
+            {"test": cls.server.url, "prod": cls.server.url},
+        )
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            banlingkit_request, "BL_LABEL_URL", cls.server.url + "/BanlingkitPrint"
+        )
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.env["delivery.carrier"].clear_caches()
+        cls.pickings = cls._create_shippings(BENCH_N)
+
+    @classmethod
+    def _carrier_values(cls):
+        return {
+            "banlingkit_api_cid": "BENCH",
+            "banlingkit_api_token": "bench-salt",
+            "banlingkit_concurrency": 8,
+            "banlingkit_pool_size": 8,
+            # Thermal labels don't need the label font, which isn't shipped
+            # with the module, so the send and render paths always run
+            "banlingkit_label_format": "zpl",
+        }
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def _report(self, name, items, elapsed, queries, operation=None):
+        """Log the benchmark results
+
+        :param str name: Benchmark name
+        :param int items: Processed items
+        :param float elapsed: Wall clock seconds
+        :param int queries: SQL queries run
+        :param str operation: API operation whose latency percentiles are shown
+        """
+        stats = {}
+        if operation:
+            stats = metrics.snapshot("BENCH").get("BENCH", {}).get(operation, {})
+        _logger.info(
+            "%s: %s items in %.3fs (%.1f/s), %s queries (%.2f/item), "
+            "API p50 %.1fms p95 %.1fms p99 %.1fms",
+            name,
+            items,
+            elapsed,
+            items / elapsed if elapsed else 0.0,
+            queries,
+            queries / items if items else 0.0,
+            stats.get("p50_ms", 0.0),
+            stats.get("p95_ms", 0.0),
+            stats.get("p99_ms", 0.0),
+        )
+
+    def _run(
+        self, name, func, items, operation=None, max_queries=None, max_seconds=None
+    ):
+        """Run and report a benchmark, failing when it's over its budgets
+
+        :param int max_queries: Queries allowed for the whole run. Defaults
+            to `MAX_QUERIES_PER_ITEM` per item.
+        :param float max_seconds: Seconds allowed for the whole run. Defaults
+            to `MAX_SECONDS_PER_ITEM` per item.
+        """
+        self.env.flush_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        result = func()
+        self.env.flush_all()
+        elapsed = time.perf_counter() - start
+        queries = self.env.cr.sql_log_count - queries
+        self._report(name, items, elapsed, queries, operation)
+        if max_queries is None:
+            max_queries = MAX_QUERIES_PER_ITEM * items
+        self.assertLessEqual(queries, max_queries, "%s: too many queries" % name)
+        if max_seconds is None:
+            max_seconds = MAX_SECONDS_PER_ITEM * items
+        self.assertLessEqual(elapsed, max_seconds, "%s: too slow" % name)
+        return result
+
+    def _skip_without_font(self):
+        if not os.path.exists(FONT_PATH):
+            self.skipTest("Label font not available")
+
+    def test_send_shipping_bulk(self):
+        self.carrier.banlingkit_bulk_send = True
+        result = self._run(
+            "send_shipping bulk",
+            lambda: self.carrier.banlingkit_send_shipping(self.pickings),
+            len(self.pickings),
+            "manifest_shipping_bulk",
+        )
+        self.assertTrue(all(vals["tracking_number"] for vals in result))
+
+    def test_send_shipping_bulk_gzip(self):
+        self.carrier.write(
+            {"banlingkit_bulk_send": True, "banlingkit_gzip_requests": True}
+        )
+        result = self._run(
+            "send_shipping bulk gzip",
+            lambda: self.carrier.banlingkit_send_shipping(self.pickings),
+            len(self.pickings),
+            "manifest_shipping_bulk",
+        )
+        self.assertTrue(all(vals["tracking_number"] for vals in result))
+
+    def test_send_shipping_parallel(self):
+        result = self._run(
+            "send_shipping parallel",
+            lambda: self.carrier.banlingkit_send_shipping(self.pickings),
+            len(self.pickings),
+            "manifest_shipping",
+        )
+        self.assertTrue(all(vals["tracking_number"] for vals in result))
+
+    def test_prepare_shipping_batch(self):
+        self.env.invalidate_all()
+        payloads = self._run(
+            "prepare_banlingkit_shipping_batch",
+            lambda: self.carrier._prepare_banlingkit_shipping_batch(self.pickings),
+            len(self.pickings),
+            max_queries=PREPARE_BATCH_MAX_QUERIES,
+        )
+        self.assertEqual(len(payloads), len(self.pickings))
+
+    def test_render_labels_pdf(self):
+        # PDF labels need the label font
+        self._skip_without_font()
+        for index, picking in enumerate(self.pickings):
+            picking.carrier_tracking_ref = "BENCH{:06d}".format(index)
+        self._run(
+            "render_label",
+            lambda: [render_label(p, use_cache=False) for p in self.pickings],
+            len(self.pickings),
+        )
+
+    def test_render_labels_batch(self):
+        for index, picking in enumerate(self.pickings):
+            picking.carrier_tracking_ref = "BENCH{:06d}".format(index)
+        stream = io.BytesIO()
+        labels = self._run(
+            "render_labels zpl",
+            lambda: render_labels(self.pickings, stream, label_format="zpl"),
+            len(self.pickings),
+        )
+        self.assertEqual(labels, len(self.pickings))
+        self.assertEqual(stream.getvalue().count(b"^XA"), len(self.pickings))
+
+    def test_render_labels_zpl(self):
+        for index, picking in enumerate(self.pickings):
+            picking.carrier_tracking_ref = "BENCH{:06d}".format(index)
+        labels = self._run(
+            "render_label zpl",
+            lambda: [
+                render_label(p, use_cache=False, label_format="zpl")
+                for p in self.pickings
+            ],
+            len(self.pickings),
+        )
+        self.assertTrue(all(label.startswith(b"^XA") for label in labels))
+
+    def test_batch_label_fetch(self):
+        references = ["BENCH{:06d}".format(i) for i in range(BENCH_N)]
+        labels = self._run(
+            "get_labels",
+            lambda: self.carrier.banlingkit_get_labels(references),
+            len(references),
+            "get_documents_multi",
+        )
+        self.assertEqual(len(labels), 1)
+
+    def test_tracking_refresh(self):
+        for index, picking in enumerate(self.pickings):
+            picking.carrier_tracking_ref = "BENCH{:06d}".format(index)
+        self._run(
+            "tracking refresh",
+            lambda: self.carrier._banlingkit_refresh_tracking(self.pickings),
+            len(self.pickings),
+            "get_tracking",
+        )
+        self.assertTrue(all(self.pickings.mapped("banlingkit_tracking_fingerprint")))
+
+    def test_tracking_push(self):
+        references = []
+        for index, picking in enumerate(self.pickings):
+            picking.carrier_tracking_ref = "BENCH{:06d}".format(index)
+            references.append(picking.carrier_tracking_ref)
+        self.carrier.banlingkit_tracking_push = True
+        events = banlingkit_request.BanlingkitExpressRequest.parse_tracking_push(
+            {
+                "data": [
+                    {"num": ref, "time": "2024-01-02 10:00:00", "status": "2"}
+                    for ref in references
+                ]
+            }
+        )
+        pushes = self.env["banlingkit.tracking.push"]._enqueue(self.carrier, events)
+        updated = self._run("tracking push", pushes._apply, len(references))
+        self.assertEqual(updated, len(references))
+        self.assertTrue(all(self.pickings.mapped("banlingkit_tracking_push_date")))
+
+    def test_import_time(self):
+        result = measure_import_time()
+        _logger.info(
+            "module import: %.1fms (budget %.1fms)",
+            result["elapsed"] * 1000,
+            IMPORT_TIME_BUDGET * 1000,
+        )
+        self.assertFalse(result["heavy"], "Heavy libraries imported at boot")
+        self.assertLess(result["elapsed"], IMPORT_TIME_BUDGET)
+
+    def test_warm_up(self):
+        elapsed = self._run(
+            "warm-up",
+            lambda: self.env["delivery.carrier"]._banlingkit_warm_up(),
+            1,
+            # Imports reportlab and parses the label font
+            max_seconds=5.0,
+        )
+        self.assertGreaterEqual(elapsed, 0.0)
@@ -0,0 +1,61 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from unittest import mock
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.banlingkit_request import BanlingkitExpressRequest
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitBulkResponse(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.bl_request = BanlingkitExpressRequest("BULK", "salt")
+        self.chunk = [{"sourceCode": "WH-OUT-%05d" % i} for i in range(3)]
+
+    def _parse(self, body, status=200):
+        response = mock.Mock(status_code=status)
+        return self.bl_request._parse_bulk_response(self.chunk, response, body)
+
+    def test_global_code(self):
+        results = self._parse({"code": 1})
+        self.assertEqual(
+            results,
+            {
+                "WH-OUT-00000": ([], "", "BULKWH-OUT-00000"),
+                "WH-OUT-00001": ([], "", "BULKWH-OUT-00001"),
+                "WH-OUT-00002": ([], "", "BULKWH-OUT-00002"),
+            },
+        )
+
+    def test_items_matched_by_source_code(self):
+        # Items come in any order and a failed one doesn't spoil the rest
+        results = self._parse(
+            {
+                "code": 0,
+                "data": [
+                    {"sourceCode": "WH-OUT-00002", "code": 1},
+                    {"sourceCode": "WH-OUT-00000", "code": 1},
+                    {"sourceCode": "WH-OUT-00001", "code": 5, "msg": "Bad address"},
+                ],
+            }
+        )
+        self.assertEqual(results["WH-OUT-00000"], ([], "", "BULKWH-OUT-00000"))
+        self.assertEqual(results["WH-OUT-00002"], ([], "", "BULKWH-OUT-00002"))
+        self.assertEqual(results["WH-OUT-00001"], ([("5", "Bad address")], "", ""))
+
+    def test_item_without_details(self):
+        # Shippings missing in the details get the global result
+        results = self._parse(
+            {"code": 0, "msg": "Partial", "data": [{"sourceCode": "WH-OUT-00000"}]}
+        )
+        self.assertEqual(results["WH-OUT-00001"], ([("0", "Partial")], "", ""))
+        self.assertEqual(results["WH-OUT-00002"], ([("0", "Partial")], "", ""))
+
+    def test_request_error(self):
+        results = self._parse(None, status=502)
+        self.assertEqual(len(results), 3)
+        for error, _documents, tracking in results.values():
+            self.assertEqual(error, [("502", "Error in request")])
+            self.assertFalse(tracking)
@@ -0,0 +1,80 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import tempfile
+import time
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.banlingkit_capture import REDACTED, CaptureWriter, load_capture
+from .common import BanlingkitTestCase
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitCapture(BaseCase):
+    def test_personal_data_redacted(self):
+        shipping = {
+            "sourceCode": "WH-OUT-00001",
+            "consignee": "Mr. Odoo & Co.",
+            "tel": "+34 600 000 000",
+            "email": "odoo@example.com",
+            "contry": "Spain",
+            "city": "Madrid",
+            "detail": "Calle de La Rua, 3",
+            "postCode": "28001",
+            "comments": None,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            writer = CaptureWriter(directory)
+            writer.write(
+                {
+                    "operation": "manifest_shipping",
+                    "headers": {"salt": REDACTED},
+                    "json": [shipping],
+                }
+            )
+            (record,) = load_capture(writer.path)
+        captured = record["json"][0]
+        for key in ("consignee", "tel", "email", "city", "detail", "postCode"):
+            self.assertEqual(captured[key], REDACTED)
+        self.assertEqual(captured["sourceCode"], "WH-OUT-00001")
+        self.assertEqual(captured["contry"], "Spain")
+        self.assertIsNone(captured["comments"])
+        # The request kept in memory isn't changed
+        self.assertEqual(shipping["consignee"], "Mr. Odoo & Co.")
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitReplay(BanlingkitTestCase):
+    def _capture(self, directory, count):
+        writer = CaptureWriter(directory)
+        url = self.carrier._bl_request().url + "/invoice/create"
+        for i in range(count):
+            writer.write(
+                {
+                    "ts": time.time(),
+                    "operation": "manifest_shipping",
+                    "method": "POST",
+                    "url": url,
+                    "json": [{"sourceCode": "WH-OUT-%05d" % i, "consignee": "Odoo"}],
+                    "latency": 0.0,
+                    "status": 200,
+                    "content_type": "application/json",
+                    "body": {"code": 1},
+                }
+            )
+        return writer.path
+
+    def test_replay_offline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self._capture(directory, 3)
+            result = self.carrier._banlingkit_replay_capture(path)
+        self.assertEqual(result["requests"], 3)
+        self.assertEqual(result["errors"], 0)
+
+    def test_replay_live_production(self):
+        self.carrier.prod_environment = True
+        with tempfile.TemporaryDirectory() as directory:
+            path = self._capture(directory, 1)
+            with self.assertRaises(UserError):
+                self.carrier._banlingkit_replay_capture(path, offline=False)
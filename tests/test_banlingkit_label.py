@@ -0,0 +1,31 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from odoo import fields
+from odoo.tests import tagged
+
+from ..models.banlingkit_label import label_cache, render_label
+from .common import BanlingkitTestCase
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitLabel(BanlingkitTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.picking = cls._create_shippings(1)
+        cls.picking.carrier_tracking_ref = "TRACK01"
+
+    def setUp(self):
+        super().setUp()
+        label_cache.clear()
+
+    def test_label_cache(self):
+        label = render_label(self.picking, label_format="zpl")
+        self.assertTrue(label.startswith(b"^XA"))
+        # Shipping writes the order after rendering the label
+        self.picking.sale_id.shipping_time = fields.Datetime.now()
+        self.picking.sale_id.flush_recordset()
+        self.assertIs(render_label(self.picking, label_format="zpl"), label)
+        # A change of a printed value renders it again
+        self.picking.sale_id.partner_id.city = "Barcelona"
+        label = render_label(self.picking, label_format="zpl")
+        self.assertIn(b"Barcelona", label)
@@ -0,0 +1,37 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Query budgets of the Banlingkit hot paths
+
+Unlike the benchmarks, they run with the standard tests, so a change that
+makes a batch path query once per picking fails here.
+"""
+from odoo.tests import tagged
+
+from .common import BanlingkitTestCase
+
+# Queries allowed to prepare the payloads of a batch, whatever its size
+PREPARE_BATCH_MAX_QUERIES = 20
+BATCH_SIZE = 10
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitPerformance(BanlingkitTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pickings = cls._create_shippings(BATCH_SIZE, lines=3)
+
+    def _assert_prepare_queries(self, pickings):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(PREPARE_BATCH_MAX_QUERIES):
+            payloads = self.carrier._prepare_banlingkit_shipping_batch(pickings)
+        self.assertEqual(len(payloads), len(pickings))
+        return payloads
+
+    def test_prepare_shipping_batch_queries(self):
+        self.assertEqual(len(self.pickings), BATCH_SIZE)
+        payloads = self._assert_prepare_queries(self.pickings[0])
+        self.assertEqual(len(payloads[self.pickings[0]]["items"]), 3)
+        # The same budget for the whole batch: no query per picking or move
+        payloads = self._assert_prepare_queries(self.pickings)
+        self.assertTrue(all(len(vals["items"]) == 3 for vals in payloads.values()))
@@ -0,0 +1,155 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import tempfile
+import time
+import uuid
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.banlingkit_circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BanlingkitCircuitOpenError,
+    CircuitBreaker,
+    get_breaker,
+)
+from ..models.banlingkit_rate_limit import (
+    BanlingkitRateLimitError,
+    TokenBucket,
+    get_bucket,
+)
+from ..models.banlingkit_request import BanlingkitExpressRequest, get_session
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitCircuitBreaker(BaseCase):
+    def _expire(self, breaker):
+        breaker.opened_at = time.monotonic() - breaker.open_timeout - 1
+
+    def test_open_after_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3)
+        for _i in range(2):
+            breaker.before_call()
+            breaker.after_call(False, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        # A success resets the count
+        breaker.before_call()
+        breaker.after_call(True, 0.1)
+        self.assertEqual(breaker.failures, 0)
+        for _i in range(3):
+            breaker.before_call()
+            breaker.after_call(False, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(BanlingkitCircuitOpenError):
+            breaker.before_call()
+
+    def test_slow_calls_fail(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, latency_threshold=1.0)
+        breaker.before_call()
+        breaker.after_call(True, 2.0)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_probe(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10.0)
+        breaker.before_call()
+        breaker.after_call(False, 0.1)
+        self._expire(breaker)
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # A single probe at a time
+        with self.assertRaises(BanlingkitCircuitOpenError):
+            breaker.before_call()
+        # A failed probe opens the circuit for twice the time
+        breaker.after_call(False, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.open_timeout, 20.0)
+        self._expire(breaker)
+        breaker.before_call()
+        breaker.after_call(True, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.open_timeout, 10.0)
+
+    def test_release(self):
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        breaker.before_call()
+        breaker.after_call(False, 0.1)
+        self._expire(breaker)
+        breaker.before_call()
+        breaker.release()
+        # Nothing was registered: the next call probes the endpoint
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(breaker.failures, 1)
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_rate_limited_probe(self):
+        account = uuid.uuid4().hex
+        bl_request = BanlingkitExpressRequest(
+            account,
+            "salt",
+            rate_limits={"default": (0.001, 1)},
+            rate_limit_wait=0,
+            breaker_threshold=1,
+        )
+        breaker = get_breaker(account, "test", **bl_request.breaker_settings)
+        breaker.before_call()
+        breaker.after_call(False, 0.1)
+        self._expire(breaker)
+        # The only token is gone, so the probe is rate limited
+        bl_request._throttle("test")
+        with self.assertRaises(BanlingkitRateLimitError):
+            bl_request._send("test", "GET", "http://127.0.0.1:9/")
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(breaker.failures, 1)
+        breaker.before_call()
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitRateLimit(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def test_burst(self):
+        bucket = TokenBucket("test", rate=0.001, burst=2, directory=self.directory)
+        bucket.acquire(timeout=0)
+        bucket.acquire(timeout=0)
+        with self.assertRaises(BanlingkitRateLimitError):
+            bucket.acquire(timeout=0)
+
+    def test_refill(self):
+        bucket = TokenBucket("test", rate=100, burst=1, directory=self.directory)
+        bucket.acquire(timeout=0)
+        start = time.monotonic()
+        bucket.acquire(timeout=1)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_shared_state(self):
+        # Buckets of other workers use the same file
+        bucket = TokenBucket("test", rate=0.001, burst=1, directory=self.directory)
+        other = TokenBucket("test", rate=0.001, burst=1, directory=self.directory)
+        bucket.acquire(timeout=0)
+        with self.assertRaises(BanlingkitRateLimitError):
+            other.acquire(timeout=0)
+
+    def test_get_bucket(self):
+        account = uuid.uuid4().hex
+        self.assertIs(
+            get_bucket(account, "test", 1, 1), get_bucket(account, "test", 1, 1)
+        )
+        self.assertIsNot(
+            get_bucket(account, "test", 1, 1), get_bucket(account, "other", 1, 1)
+        )
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitRetries(BaseCase):
+    def test_retry_methods(self):
+        session = get_session(pool_size=1, max_retries=2)
+        retry = session.get_adapter("http://").max_retries
+        for method in ("GET", "HEAD", "OPTIONS"):
+            self.assertTrue(retry.is_retry(method, 503))
+        # Shippings (POST) and pickups (PUT) would be created twice
+        for method in ("POST", "PUT"):
+            self.assertFalse(retry.is_retry(method, 503))
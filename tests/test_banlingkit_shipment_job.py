@@ -0,0 +1,182 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import io
+import time
+from datetime import timedelta
+from unittest import mock
+
+from odoo import fields
+from odoo.tests import tagged
+
+from ..models.banlingkit_request import BanlingkitExpressRequest
+from ..models.banlingkit_shipment_job import JOB_BACKOFF_BASE
+from .common import BanlingkitTestCase
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitShipmentJob(BanlingkitTestCase):
+    @classmethod
+    def _carrier_values(cls):
+        return {
+            "banlingkit_async_send": True,
+            "banlingkit_async_max_attempts": 3,
+            "banlingkit_label_format": "zpl",
+        }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pickings = cls._create_shippings(3)
+        cls.Job = cls.env["banlingkit.shipment.job"]
+
+    def _patch_carrier(self, method, **kwargs):
+        return mock.patch.object(type(self.carrier), method, **kwargs)
+
+    def _created(self, carrier, payloads, bl_request):
+        return [
+            ([], "", "TRACK%s" % i, io.BytesIO(b"^XA^XZ"))
+            for i, _vals in enumerate(payloads)
+        ]
+
+    def test_enqueue(self):
+        picking = self.pickings[0]
+        with self._patch_carrier("_banlingkit_create_shippings") as create:
+            picking.send_to_shipper()
+        create.assert_not_called()
+        job = self.Job.search([("picking_id", "=", picking.id)])
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.carrier_id, self.carrier)
+        self.assertFalse(picking.carrier_tracking_ref)
+
+    def test_acquire(self):
+        other_carrier = self.carrier.copy()
+        now = fields.Datetime.now()
+        jobs = self.Job._enqueue(self.pickings)
+        jobs[0].next_attempt = now - timedelta(minutes=5)
+        jobs[1].next_attempt = now + timedelta(minutes=5)
+        done = self.Job.create(
+            {
+                "picking_id": self.pickings[0].id,
+                "carrier_id": self.carrier.id,
+                "state": "done",
+            }
+        )
+        other = self.Job.create(
+            {"picking_id": self.pickings[0].id, "carrier_id": other_carrier.id}
+        )
+        acquired = self.Job._acquire(10, self.carrier)
+        # Only the due pending jobs of the carrier, the oldest attempt first
+        self.assertEqual(acquired.ids, [jobs[0].id, jobs[2].id])
+        self.assertNotIn(done, acquired)
+        self.assertNotIn(other, acquired)
+        self.assertEqual(self.Job._acquire(1, self.carrier), jobs[0])
+        # The rows are locked (FOR UPDATE) until the transaction ends
+        self.env.cr.execute(
+            """
+            SELECT mode FROM pg_locks
+            WHERE relation = 'banlingkit_shipment_job'::regclass
+                AND pid = pg_backend_pid()
+            """
+        )
+        self.assertIn("RowShareLock", [row[0] for row in self.env.cr.fetchall()])
+
+    def test_retry_later(self):
+        job = self.Job._enqueue(self.pickings[0])
+        for attempt in range(1, 3):
+            before = fields.Datetime.now()
+            job._retry_later("Timeout")
+            self.assertEqual(job.attempts, attempt)
+            self.assertEqual(job.state, "pending")
+            self.assertEqual(job.error, "Timeout")
+            # The delay doubles on every attempt
+            self.assertGreaterEqual(
+                job.next_attempt,
+                before + timedelta(seconds=JOB_BACKOFF_BASE * 2 ** (attempt - 1)),
+            )
+        messages = len(job.picking_id.message_ids)
+        job._retry_later("Timeout")
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(len(job.picking_id.message_ids), messages + 1)
+
+    def test_process(self):
+        jobs = self.Job._enqueue(self.pickings)
+        with self._patch_carrier(
+            "_banlingkit_create_shippings", side_effect=self._created, autospec=True
+        ) as create:
+            self.Job._cron_process_jobs()
+        create.assert_called_once()
+        self.assertEqual(set(jobs.mapped("state")), {"done"})
+        self.assertEqual(jobs.mapped("tracking_ref"), ["TRACK0", "TRACK1", "TRACK2"])
+        self.assertEqual(
+            self.pickings.mapped("carrier_tracking_ref"), ["TRACK0", "TRACK1", "TRACK2"]
+        )
+        # Core posted the shipping
+        self.assertTrue(
+            self.pickings[0].message_ids.filtered(
+                lambda m: "Shipment sent to carrier" in (m.body or "")
+            )
+        )
+
+    def test_process_api_error(self):
+        job = self.Job._enqueue(self.pickings[0])
+        with self._patch_carrier(
+            "_banlingkit_create_shippings",
+            return_value=[([("E01", "Bad address")], "", "", None)],
+        ):
+            job._process()
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("Bad address", job.error)
+        self.assertFalse(job.picking_id.carrier_tracking_ref)
+
+    def test_process_finish_error(self):
+        job = self.Job._enqueue(self.pickings[0])
+        with self._patch_carrier(
+            "_banlingkit_create_shippings", side_effect=self._created, autospec=True
+        ) as create, self._patch_carrier(
+            "_banlingkit_finish_shipping", side_effect=Exception("Label failed")
+        ):
+            job._process()
+            # The shipping exists at Banlingkit: it's never sent again
+            self.Job._cron_process_jobs()
+        create.assert_called_once()
+        self.assertEqual(job.state, "done")
+        self.assertEqual(job.tracking_ref, "TRACK0")
+        self.assertEqual(job.picking_id.carrier_tracking_ref, "TRACK0")
+        self.assertIn("Label failed", job.error)
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitShipmentJobParallel(BanlingkitTestCase):
+    @classmethod
+    def _carrier_values(cls):
+        return {
+            "banlingkit_async_send": True,
+            "banlingkit_concurrency": 4,
+            "banlingkit_label_format": "zpl",
+        }
+
+    def test_process_parallel(self):
+        pickings = self._create_shippings(4)
+        codes = [picking.name.replace("/", "-") for picking in pickings]
+
+        def manifest_shipping(bl_request, shipping_values):
+            # The first shippings answer last
+            code = shipping_values["sourceCode"]
+            time.sleep(0.05 * (len(codes) - codes.index(code)))
+            return "1", "", "TRK" + code
+
+        jobs = self.env["banlingkit.shipment.job"]._enqueue(pickings)
+        with mock.patch.object(
+            BanlingkitExpressRequest,
+            "manifest_shipping",
+            side_effect=manifest_shipping,
+            autospec=True,
+        ) as manifest:
+            jobs._process()
+        self.assertEqual(manifest.call_count, 4)
+        # Results are applied to their own picking whatever the answer order
+        self.assertEqual(set(jobs.mapped("state")), {"done"})
+        self.assertEqual(
+            pickings.mapped("carrier_tracking_ref"), ["TRK" + code for code in codes]
+        )
+        self.assertEqual(jobs.mapped("tracking_ref"), ["TRK" + code for code in codes])
@@ -0,0 +1,54 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from datetime import datetime
+
+from odoo.tests import tagged
+
+from .common import BanlingkitTestCase
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitTracking(BanlingkitTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.picking = cls._create_picking(carrier_tracking_ref="TRACK01")
+
+    def _tracking(self, hour, status):
+        return {
+            "StatusDateTime": datetime(2024, 1, 1, hour),
+            "StatusCode": status,
+            "StatusDescription": "Status %s" % status,
+            "IncidentCode": "",
+            "IncidentDescription": "",
+        }
+
+    def test_tracking_changes(self):
+        recorded, transit, delivered = (
+            self._tracking(8, "0"),
+            self._tracking(10, "2"),
+            self._tracking(12, "4"),
+        )
+        self.carrier._banlingkit_apply_tracking(self.picking, [recorded, delivered])
+        self.assertEqual(len(self.picking.banlingkit_tracking_event_ids), 2)
+        self.assertEqual(self.picking.delivery_state, "customer_delivered")
+        fingerprint = self.picking.banlingkit_tracking_fingerprint
+        # Nothing new
+        self.assertIsNone(
+            self.carrier._banlingkit_tracking_changes(self.picking, [recorded])
+        )
+        self.assertIsNone(
+            self.carrier._banlingkit_tracking_changes(
+                self.picking, [recorded, delivered]
+            )
+        )
+        # A late push is stored but doesn't take the state back
+        self.carrier._banlingkit_apply_tracking(self.picking, [transit])
+        self.assertEqual(len(self.picking.banlingkit_tracking_event_ids), 3)
+        self.assertEqual(self.picking.delivery_state, "customer_delivered")
+        self.assertEqual(self.picking.banlingkit_tracking_fingerprint, fingerprint)
+        # The history stays sorted by date
+        history = self.picking.tracking_state_history.split("\n")
+        self.assertEqual(len(history), 3)
+        for line, status in zip(history, ("Status 0", "Status 2", "Status 4")):
+            self.assertIn(status, line)
+        self.assertIn("Status 4", self.picking.tracking_state)
@@ -0,0 +1,53 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import json
+
+from odoo.tests import tagged
+
+from .common import BanlingkitHttpCase
+
+PUSH_URL = "/delivery/banlingkit/tracking"
+
+
+@tagged("-at_install", "post_install")
+class TestBanlingkitTrackingPush(BanlingkitHttpCase):
+    @classmethod
+    def _carrier_values(cls):
+        return {"banlingkit_tracking_push": True}
+
+    def _push(self, headers):
+        payload = {"num": "TRACK01", "time": "2024-01-02 10:00:00", "status": "2"}
+        return self.url_open(
+            PUSH_URL,
+            data=json.dumps(payload),
+            headers=dict(headers, **{"Content-Type": "application/json"}),
+        )
+
+    def _queued(self):
+        return self.env["banlingkit.tracking.push"].search(
+            [("carrier_id", "=", self.carrier.id)]
+        )
+
+    def test_push_rejected(self):
+        for headers in (
+            {},
+            {"cid": "TEST"},
+            {"cid": "TEST", "salt": "wrong-salt"},
+            {"cid": "OTHER", "salt": "test-salt"},
+        ):
+            response = self._push(headers)
+            self.assertEqual(response.status_code, 401, headers)
+        self.assertFalse(self._queued())
+
+    def test_push_disabled(self):
+        self.carrier.banlingkit_tracking_push = False
+        self.env.flush_all()
+        response = self._push({"cid": "TEST", "salt": "test-salt"})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self._queued())
+
+    def test_push_accepted(self):
+        response = self._push({"cid": "TEST", "salt": "test-salt"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        push = self._queued()
+        self.assertEqual(push.tracking_ref, "TRACK01")
@@ -1,16 +1,52 @@
 # Copyright 2022 Tecnativa - David Vidal
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
-import base64
+import csv
+import io
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from odoo import fields, models
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Accounts whose manifests are requested at the same time
+MANIFEST_WORKERS = 8
+# Rows fetched at once from the database when building local manifests
+MANIFEST_FETCH_SIZE = 2000
+MANIFEST_COLUMNS = [
+    "Account",
+    "Date",
+    "Tracking number",
+    "Picking",
+    "Order",
+    "Recipient",
+    "Street",
+    "City",
+    "Zip",
+    "State",
+    "Country",
+    "Moves",
+    "Quantity",
+    "Weight",
+]
 
 
 class BanlingkitExpressManifestWizard(models.TransientModel):
     _name = "banlingkit.manifest.wizard"
     _description = "Get the Banlingkit Express Manifest for the given date range"
 
+    source = fields.Selection(
+        selection=[("local", "Odoo shippings"), ("remote", "Banlingkit service")],
+        default="local",
+        required=True,
+        help="Build the manifest from the shippings recorded in Odoo or ask "
+        "Banlingkit for it.",
+    )
     document_type = fields.Selection(
-        selection=[("XLSX", "Excel"), ("PDF", "PDF")],
+        selection=[("XLSX", "Excel"), ("CSV", "CSV"), ("PDF", "PDF")],
         string="Format",
         default="XLSX",
         required=True,
@@ -32,53 +68,225 @@ class BanlingkitExpressManifestWizard(models.TransientModel):
         comodel_name="ir.attachment", readonly=True, string="Manifests"
     )
 
-    def get_manifest(self):
-        """List of shippings for the given dates as Banlingkit provides them"""
+    def _get_account_carriers(self):
+        """One carrier per Banlingkit account. Carriers with different service
+        configuration would produce the same manifest.
+
+        :return recordset: `delivery.carrier` recordset
+        """
         carriers = self.carrier_ids or self.env["delivery.carrier"].search(
             [("delivery_type", "=", "banlingkit")]
         )
-        # Avoid getting repeated manifests. Carriers with different service
-        # configuration would produce the same manifest.
-        unique_accounts = {
-            (c.banlingkit_customer, c.banlingkit_contract, c.banlingkit_agency)
-            for c in carriers
+        accounts = {}
+        for carrier in carriers:
+            accounts.setdefault(
+                (carrier.banlingkit_api_cid, carrier.prod_environment), carrier
+            )
+        return self.env["delivery.carrier"].union(*accounts.values())
+
+    def _manifest_query(self, carriers):
+        """Single aggregate query with a row per shipping in the date range
+
+        :param recordset carriers: `delivery.carrier` recordset
+        :return tuple: (query, params)
+        """
+        query = """
+            SELECT
+                dc.banlingkit_api_cid,
+                sp.date_done,
+                sp.carrier_tracking_ref,
+                sp.name,
+                so.name,
+                rp.name,
+                rp.street,
+                rp.city,
+                rp.zip,
+                rcs.name,
+                COALESCE(rc.name->>%(lang)s, rc.name->>'en_US'),
+                COUNT(sm.id),
+                COALESCE(SUM(sm.product_uom_qty), 0),
+                sp.shipping_weight
+            FROM stock_picking sp
+            JOIN delivery_carrier dc ON dc.id = sp.carrier_id
+            LEFT JOIN stock_move sm ON sm.picking_id = sp.id
+            LEFT JOIN sale_order so ON so.id = sp.sale_id
+            LEFT JOIN res_partner rp ON rp.id = sp.partner_id
+            LEFT JOIN res_country rc ON rc.id = rp.country_id
+            LEFT JOIN res_country_state rcs ON rcs.id = rp.state_id
+            WHERE sp.carrier_id IN %(carriers)s
+                AND sp.state = 'done'
+                AND sp.carrier_tracking_ref IS NOT NULL
+                AND sp.date_done >= %(from_date)s
+                AND sp.date_done < %(to_date)s
+            GROUP BY dc.id, sp.id, so.id, rp.id, rc.id, rcs.id
+            ORDER BY dc.banlingkit_api_cid, sp.date_done, sp.id
+        """
+        params = {
+            "lang": self.env.lang or "en_US",
+            "carriers": tuple(carriers.ids),
+            "from_date": self.from_date,
+            "to_date": self.to_date + timedelta(days=1),
         }
-        filtered_carriers = self.env["delivery.carrier"]
-        for customer, contract, agency in unique_accounts:
-            filtered_carriers += fields.first(
-                carriers.filtered(
-                    lambda x: x.banlingkit_customer == customer
-                    and x.banlingkit_contract == contract
-                    and x.banlingkit_agency == agency
-                )
+        return query, params
+
+    def _manifest_rows(self, carriers):
+        """Stream the manifest rows from a server side cursor
+
+        :param recordset carriers: `delivery.carrier` recordset
+        :return generator: Rows as tuples
+        """
+        self.env.flush_all()
+        query, params = self._manifest_query(carriers)
+        # A named cursor keeps the result in the server and fetches it in
+        # batches, so memory doesn't grow with the number of shippings.
+        with self.env.cr._cnx.cursor("banlingkit_manifest") as cursor:
+            cursor.itersize = MANIFEST_FETCH_SIZE
+            cursor.execute(query, params)
+            yield from cursor
+
+    @staticmethod
+    def _write_csv(rows, stream):
+        """Write the manifest rows as CSV
+
+        :param iterable rows: Manifest rows
+        :param file stream: Binary file object
+        """
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(MANIFEST_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+        text.flush()
+        text.detach()
+
+    @staticmethod
+    def _write_xlsx(rows, stream):
+        """Write the manifest rows as XLSX keeping a single row in memory
+
+        :param iterable rows: Manifest rows
+        :param file stream: Binary file object
+        """
+        import xlsxwriter
+
+        workbook = xlsxwriter.Workbook(stream, {"constant_memory": True})
+        sheet = workbook.add_worksheet("Manifest")
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        sheet.write_row(0, 0, MANIFEST_COLUMNS)
+        for index, row in enumerate(rows, 1):
+            sheet.write_row(index, 0, row[:1])
+            if row[1]:
+                sheet.write_datetime(index, 1, row[1], date_format)
+            sheet.write_row(
+                index, 2, ["" if value is None else value for value in row[2:]]
+            )
+        workbook.close()
+
+    def _get_local_manifest(self):
+        """Build the manifest of all the accounts from the Odoo shippings"""
+        carriers = self.carrier_ids or self.env["delivery.carrier"].search(
+            [("delivery_type", "=", "banlingkit")]
+        )
+        if self.document_type not in ("XLSX", "CSV"):
+            raise UserError(_("Local manifests can only be built as Excel or CSV."))
+        if not carriers:
+            return
+        extension = self.document_type.lower()
+        with tempfile.TemporaryFile() as stream:
+            rows = self._manifest_rows(carriers)
+            if extension == "csv":
+                self._write_csv(rows, stream)
+            else:
+                self._write_xlsx(rows, stream)
+            stream.seek(0)
+            filename = "banlingkit-{}-{}.{}".format(
+                fields.Date.to_string(self.from_date).replace("-", ""),
+                fields.Date.to_string(self.to_date).replace("-", ""),
+                extension,
             )
-        for carrier in filtered_carriers:
-            bl_request = carrier._bl_request()
-            from_date = fields.Date.to_string(self.from_date)
-            to_date = fields.Date.to_string(self.to_date)
-            error, manifest = bl_request.report_shipping(
-                "ODOO", self.document_type, from_date, to_date
+            self.attachment_ids += self.env[
+                "delivery.carrier"
+            ]._banlingkit_stream_attachment(
+                {
+                    "name": filename,
+                    "res_model": self._name,
+                    "res_id": self.id,
+                    "type": "binary",
+                },
+                stream,
+            )
+
+    def get_manifest(self):
+        """List of shippings for the given dates"""
+        if self.source == "local":
+            self._get_local_manifest()
+            self.state = "done"
+            return dict(
+                self.env["ir.actions.act_window"]._for_xml_id(
+                    "delivery_banlingkit.action_delivery_banlingkit_manifest_wizard"
+                ),
+                res_id=self.id,
             )
-            carrier._bl_check_error(error)
+        return self._get_remote_manifest()
+
+    def _get_remote_manifest(self):
+        """List of shippings for the given dates as Banlingkit provides them"""
+        from_date = fields.Date.to_string(self.from_date)
+        to_date = fields.Date.to_string(self.to_date)
+        # Read in the main thread, the workers don't touch the ORM
+        document_type = self.document_type
+        carriers = self._get_account_carriers()
+        account_requests = [(carrier, carrier._bl_request()) for carrier in carriers]
+
+        def fetch(bl_request):
+            try:
+                error, manifest = bl_request.report_shipping(
+                    "ODOO", document_type, from_date, to_date
+                )
+            except Exception as e:
+                error, manifest = [("", str(e))], []
+            # The last call of a thread is only known in that thread
+            return error, manifest, bl_request.last_record
+
+        # Accounts are queried at once, so it takes as long as the slowest
+        with ThreadPoolExecutor(
+            max_workers=max(min(MANIFEST_WORKERS, len(account_requests)), 1)
+        ) as executor:
+            responses = list(executor.map(fetch, [r for _c, r in account_requests]))
+        errors = []
+        for (carrier, bl_request), (error, manifest, record) in zip(
+            account_requests, responses
+        ):
+            bl_request.last_record = record
             carrier._bl_log_request(bl_request)
-            for _filename, file in manifest:
-                filename = "{}{}{}-{}-{}.{}".format(
-                    carrier.banlingkit_customer,
-                    carrier.banlingkit_contract,
-                    carrier.banlingkit_agency,
+            if error:
+                _logger.warning(
+                    "Banlingkit manifest of %s failed: %s", carrier.name, error
+                )
+                errors.append(carrier.name)
+                continue
+            for index, (_filename, file) in enumerate(manifest, 1):
+                filename = "{}-{}-{}{}.{}".format(
+                    carrier.banlingkit_api_cid,
                     from_date.replace("-", ""),
                     to_date.replace("-", ""),
+                    "-{}".format(index) if len(manifest) > 1 else "",
                     self.document_type.lower(),
                 )
-                self.attachment_ids += self.env["ir.attachment"].create(
+                stream = file if hasattr(file, "read") else io.BytesIO(file)
+                self.attachment_ids += carrier._banlingkit_stream_attachment(
                     {
-                        "datas": base64.b64encode(file),
                         "name": filename,
                         "res_model": self._name,
                         "res_id": self.id,
                         "type": "binary",
-                    }
+                    },
+                    stream,
                 )
+        if errors and not self.attachment_ids:
+            raise UserError(
+                _("The manifests of these accounts couldn't be gathered:\n%s")
+                % "\n".join(errors)
+            )
         self.state = "done"
         return dict(
             self.env["ir.actions.act_window"]._for_xml_id(